@@ -0,0 +1,106 @@
+import asyncio
+import os
+import random
+from concurrent.futures import Executor
+from functools import partial
+from typing import Iterable, List, Tuple, Union
+from config import config_cache
+from print import render_addition_pdf
+
+
+def write_file(path: str, data: bytes, fsync: bool = True) -> None:
+    """
+    Writes data to path through a temporary file, so a reader never sees a partially written pack
+    even if the storage goes away halfway through.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+async def write_packs(
+    jobs: Iterable[dict],
+    output_dir: str = "output",
+    executor: Union[Executor, None] = None,
+    max_renders: int = 4,
+    max_queued: int = 4,
+    writers: int = 2,
+    fsync: bool = True,
+    config_path: Union[str, None] = None,
+) -> List[str]:
+    """
+    Renders a batch of packs and writes them to output_dir, hiding slow (e.g. network mounted)
+    storage behind rendering. Every job is a dict with a filename and the render_addition_pdf
+    arguments (pages, backend, seed). Packs are rendered with the config at config_path, the
+    process's config when None, in worker processes too.
+
+    Rendering runs in executor (the default thread pool when None, pass a ProcessPoolExecutor to
+    render on several cores) with at most max_renders packs in flight. Rendered packs go through a
+    queue of max_queued packs to the writer tasks, which write and fsync them in threads. When the
+    storage stalls the queue fills up and rendering waits, so at most
+    max_renders + max_queued + writers rendered packs are held in memory at any time: the ones
+    being rendered, the queued ones and the one every writer is writing.
+
+    Returns the paths of the written packs in job order.
+    """
+    loop = asyncio.get_running_loop()
+    # spawned worker processes don't share use_config() with this one, they get the path
+    config_path = config_cache(config_path).path
+    queue: asyncio.Queue[Tuple[str, bytes]] = asyncio.Queue(maxsize=max_queued)
+    render_slots = asyncio.Semaphore(max_renders)
+    write_errors: List[BaseException] = []
+    paths = []
+
+    async def render(job: dict, path: str) -> None:
+        try:
+            data = await loop.run_in_executor(
+                executor,
+                partial(
+                    render_addition_pdf,
+                    pages=job.get("pages", 1),
+                    backend=job.get("backend", "reportlab"),
+                    seed=job["seed"],
+                    config_path=config_path,
+                ),
+            )
+            # blocks while the writers are behind, which is the backpressure on rendering
+            await queue.put((path, data))
+        finally:
+            render_slots.release()
+
+    async def write() -> None:
+        while True:
+            path, data = await queue.get()
+            try:
+                await asyncio.to_thread(write_file, path, data, fsync)
+            # any error is recorded and raised at the end, a writer that died here would leave
+            # queue.join() waiting forever
+            except Exception as e:
+                write_errors.append(e)
+            finally:
+                queue.task_done()
+
+    writer_tasks = [asyncio.create_task(write()) for _ in range(writers)]
+    render_tasks = []
+    try:
+        for job in jobs:
+            path = os.path.join(output_dir, job["filename"])
+            paths.append(path)
+            # every pack needs its own seed, otherwise forked worker processes that share the
+            # parent's random state would all render the same problems
+            if job.get("seed") is None:
+                job = {**job, "seed": random.getrandbits(64)}
+            await render_slots.acquire()
+            render_tasks.append(asyncio.create_task(render(job, path)))
+        await asyncio.gather(*render_tasks)
+        await queue.join()
+    finally:
+        for task in render_tasks + writer_tasks:
+            task.cancel()
+    if write_errors:
+        raise write_errors[0]
+    return paths
@@ -0,0 +1,47 @@
+"""
+Compares the throughput of the reportlab canvas with the native content-stream backend
+(native_canvas.py) on a multi page pack.
+
+    python benchmarks/bench_backends.py --pages 1000
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import io
+import random
+import time
+from reportlab.lib.pagesizes import A4
+from print import BACKENDS, generate_page
+
+
+def bench_backend(backend: str, pages: int, seed: int) -> float:
+    random.seed(seed)
+    start = time.perf_counter()
+    c = BACKENDS[backend](io.BytesIO(), pagesize=A4)
+    for _ in range(pages):
+        generate_page(c)
+    c.save()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timings = {}
+    for backend in BACKENDS:
+        timings[backend] = bench_backend(backend, args.pages, args.seed)
+        print(
+            f"{backend:>10}: {timings[backend]:.2f}s "
+            f"({args.pages / timings[backend]:.0f} pages/s)"
+        )
+    print(f"speedup: {timings['reportlab'] / timings['native']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Times the vectorized carry/borrow analysis (difficulty.py) on a bank of candidate pairs.
+
+    python benchmarks/bench_difficulty.py --pairs 10000000
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import time
+import numpy as np
+from difficulty import borrow_counts, carry_counts, difficulty_keys
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=10_000_000)
+    parser.add_argument("--max-number", type=int, default=9999)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, args.max_number + 1, args.pairs)
+    b = rng.integers(0, args.max_number + 1, args.pairs)
+    for name, analyze in (
+        ("carry_counts", lambda: carry_counts(a, b)),
+        ("borrow_counts", lambda: borrow_counts(a, b)),
+        ("difficulty_keys", lambda: difficulty_keys(a, b, "+")),
+    ):
+        start = time.perf_counter()
+        analyze()
+        print(f"{name:>16}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares rendering a pack in a TrueType font (Vera, which ships with reportlab) with the same
+pack in Helvetica. The TrueType pack should stay within 10% of the Helvetica one.
+
+    python benchmarks/bench_fonts.py --pages 500
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import gc
+import tempfile
+import time
+import reportlab
+import yaml
+from config import DEFAULT_CONFIG_PATH, load_config, use_config
+from print import clear_page_cache, render_addition_pdf
+from shapes import layout_shape
+
+TTF_PATH = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+
+
+def write_font_config(font: str, config_dir: str) -> str:
+    config = {**load_config(DEFAULT_CONFIG_PATH), "TEXT_FONT": font}
+    path = os.path.join(config_dir, f"{os.path.basename(font)}.yml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def bench_font(config_path: str, pages: int, seed: int) -> float:
+    use_config(config_path)
+    # every run starts from the same state, otherwise the font measured second pays for the
+    # shape layouts the first one left behind
+    layout_shape.cache_clear()
+    clear_page_cache()
+    gc.collect()
+    # the first page registers the font and warms up, like any long running process
+    render_addition_pdf(1, seed=seed)
+    start = time.perf_counter()
+    render_addition_pdf(pages, seed=seed)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fonts = ("Helvetica", TTF_PATH)
+    timings = {font: [] for font in fonts}
+    with tempfile.TemporaryDirectory() as config_dir:
+        config_paths = {font: write_font_config(font, config_dir) for font in fonts}
+        # the fonts take turns so drift in the machine's speed hits both the same
+        for _ in range(args.repeat):
+            for font in fonts:
+                timings[font].append(
+                    bench_font(config_paths[font], args.pages, args.seed)
+                )
+    use_config(DEFAULT_CONFIG_PATH)
+
+    for font in fonts:
+        print(
+            f"{os.path.basename(font):>10}: {min(timings[font]):.2f}s "
+            f"({args.pages / min(timings[font]):.0f} pages/s)"
+        )
+    overhead = min(timings[TTF_PATH]) / min(timings["Helvetica"]) - 1
+    print(f"ttf overhead: {overhead:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
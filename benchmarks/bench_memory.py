@@ -0,0 +1,43 @@
+"""
+Renders a pack under the memory profiler (memory.py) and reports the growth per page and per
+shape class. Exits with an error when the growth per page exceeds --max-growth-per-page.
+
+    python benchmarks/bench_memory.py --pages 2000 --max-growth-per-page 100000
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+from memory import MemoryGrowthError, MemoryProfiler
+from print import BACKENDS, render_addition_pdf
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--backend", choices=list(BACKENDS.keys()), default="reportlab")
+    parser.add_argument("--max-growth-per-page", type=int)
+    parser.add_argument("--warmup-pages", type=int, default=5)
+    parser.add_argument("--min-pages", type=int, default=20)
+    args = parser.parse_args()
+
+    profiler = MemoryProfiler(
+        args.max_growth_per_page, args.warmup_pages, args.min_pages
+    )
+    with profiler:
+        try:
+            render_addition_pdf(
+                args.pages, args.backend, seed=0, memory_profiler=profiler
+            )
+        except MemoryGrowthError as e:
+            print(profiler.summary())
+            print(e)
+            return 1
+    print(profiler.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
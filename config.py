@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple, Union
+import yaml
+
+DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "conf.yml"
+)
+
+
+class ConfigCache:
+    """
+    Parsed config file that stays fresh in long running processes. The file is only re-read when
+    its mtime or size changes (checked at most every check_interval seconds), and structures
+    derived from the config are only rebuilt when the parsed config actually changed.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        self.version = 0
+        # the config and the structures derived from it, replaced together so a reader never
+        # pairs a config with another version's derived structures
+        self._state: Union[Tuple[dict, Dict[str, Any]], None] = None
+        self._stat: Union[Tuple[int, int], None] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        return self._current()[0]
+
+    def _current(self) -> Tuple[dict, Dict[str, Any]]:
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked_at < self.check_interval:
+            return state
+        with self._lock:
+            self._checked_at = now
+            stat = os.stat(self.path)
+            if self._state is not None and self._stat == (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                return self._state
+            with open(self.path, "r") as f:
+                config = yaml.safe_load(f)
+            self._stat = (stat.st_mtime_ns, stat.st_size)
+            if self._state is None or config != self._state[0]:
+                self._state = (config, {})
+                self.version += 1
+            return self._state
+
+    def derived(self, name: str, build: Callable[[dict], Any]) -> Any:
+        """
+        Returns build(config), computed once per config version and cached under name.
+        """
+        config, derived = self._current()
+        if name not in derived:
+            derived[name] = build(config)
+        return derived[name]
+
+
+class FixedConfig(ConfigCache):
+    """
+    A config that isn't read from a file, e.g. the one stored in a pack. Its path only places it:
+    relative font paths are resolved against the path's directory like for a config file there.
+    """
+
+    def __init__(self, path: str, config: dict):
+        super().__init__(path)
+        self._state = (config, {})
+        self.version = 1
+
+    def _current(self) -> Tuple[dict, Dict[str, Any]]:
+        return self._state
+
+
+_caches: Dict[str, ConfigCache] = {}
+_default_path = DEFAULT_CONFIG_PATH
+
+
+def use_config(path: str) -> None:
+    """
+    Makes path the config every load_config() call without an explicit path reads.
+    """
+    global _default_path
+    _default_path = os.path.abspath(path)
+
+
+def config_cache(path: Union[str, None] = None) -> ConfigCache:
+    path = os.path.abspath(path or _default_path)
+    if path not in _caches:
+        _caches[path] = ConfigCache(path)
+    return _caches[path]
+
+
+def fixed_config(config: dict, directory: str) -> str:
+    """
+    Makes config available under a path in directory that no file backs and returns that path,
+    to be passed wherever a config path is taken. config has to be JSON serializable.
+    """
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    path = os.path.join(os.path.abspath(directory), f"<fixed config {digest[:16]}>.yml")
+    if path not in _caches:
+        _caches[path] = FixedConfig(path, config)
+    return path
+
+
+def load_config(path: Union[str, None] = None) -> dict:
+    return config_cache(path).get()
+
+
+def derived(
+    name: str, build: Callable[[dict], Any], path: Union[str, None] = None
+) -> Any:
+    return config_cache(path).derived(name, build)
@@ -0,0 +1,84 @@
+import numpy as np
+
+# Difficulty analysis for whole banks of problems at once. a and b are integer arrays of the same
+# shape, one entry per problem. What makes a multi digit problem hard is the number of columns that
+# need regrouping (carrying for addition, borrowing for subtraction), more than the size of the
+# numbers themselves.
+
+
+def digit_widths(numbers: np.ndarray) -> np.ndarray:
+    """
+    Number of decimal digits of every number, ignoring the sign. 0 has one digit.
+    """
+    numbers = np.abs(np.asarray(numbers, dtype=np.int64))
+    widths = np.ones(numbers.shape, dtype=np.int8)
+    power = 10
+    while True:
+        wider = numbers >= power
+        if not wider.any():
+            return widths
+        widths += wider
+        power *= 10
+
+
+def carry_counts(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Number of columns that produce a carry when adding a + b the way it is done on paper.
+    """
+    a = np.abs(np.asarray(a, dtype=np.int64))
+    b = np.abs(np.asarray(b, dtype=np.int64))
+    carries = np.zeros(a.shape, dtype=np.int8)
+    carry = np.zeros(a.shape, dtype=np.int64)
+    while a.any() or b.any():
+        a, a_digit = np.divmod(a, 10)
+        b, b_digit = np.divmod(b, 10)
+        carry = (a_digit + b_digit + carry) >= 10
+        carries += carry
+    return carries
+
+
+def borrow_counts(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Number of columns that need a borrow when subtracting on paper. Kids always subtract the
+    smaller number from the larger one, so the operands are ordered first.
+    """
+    a = np.abs(np.asarray(a, dtype=np.int64))
+    b = np.abs(np.asarray(b, dtype=np.int64))
+    a, b = np.maximum(a, b), np.minimum(a, b)
+    borrows = np.zeros(a.shape, dtype=np.int8)
+    borrow = np.zeros(a.shape, dtype=np.int64)
+    while b.any() or borrow.any():
+        a, a_digit = np.divmod(a, 10)
+        b, b_digit = np.divmod(b, 10)
+        borrow = (a_digit - b_digit - borrow) < 0
+        borrows += borrow
+    return borrows
+
+
+def regrouping_counts(a: np.ndarray, b: np.ndarray, operator: str) -> np.ndarray:
+    if operator == "+":
+        return carry_counts(a, b)
+    if operator == "-":
+        return borrow_counts(a, b)
+    raise ValueError(
+        f"Carry and borrow analysis only applies to + and -, not {operator}"
+    )
+
+
+def difficulty_keys(a: np.ndarray, b: np.ndarray, operator: str) -> np.ndarray:
+    """
+    Sort key for a bank of problems, smaller is easier. Problems are ordered by the number of
+    regroupings, then by the width of the widest operand and finally by the same measure
+    SingleProblemMathProperties uses (smaller operand for +, larger operand for -).
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    if operator == "+":
+        tie_breaker = np.minimum(a, b)
+    else:
+        tie_breaker = np.maximum(a, b)
+    widths = np.maximum(digit_widths(a), digit_widths(b)).astype(np.int64)
+    regroupings = regrouping_counts(a, b, operator).astype(np.int64)
+    # the tie breaker is shifted so it never overflows into the width and regrouping digits
+    tie_breaker = tie_breaker - tie_breaker.min(initial=0)
+    return (regroupings * 32 + widths) * (2**40) + tie_breaker
@@ -0,0 +1,184 @@
+import sys
+from typing import Any, List, Tuple
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.pdfgeom import bezierArc
+
+# a single recorded call, e.g. ("circle", (x, y, r))
+Op = Tuple[str, Tuple[Any, ...]]
+_OP_NAMES = frozenset(
+    "circle close curveTo drawPath drawString ellipse lineTo moveTo rect restoreState "
+    "rotate saveState setFont translate".split()
+)
+
+
+def _recorded_size(value: Any) -> int:
+    # op names are shared string constants and stroke/fill/font sizes small cached ints, so
+    # only the containers, coordinates and drawn text belong to a recording
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(
+            _recorded_size(item)
+            for item in value
+            if not (isinstance(item, str) and item in _OP_NAMES)
+        )
+    if isinstance(value, (float, str)):
+        return sys.getsizeof(value)
+    return 0
+
+
+class RecordingPath:
+    """
+    Path object handed out by DisplayList.beginPath. It records path construction calls so they can
+    be replayed onto any canvas' own path object.
+    """
+
+    def __init__(self):
+        self.ops: List[Op] = []
+
+    def moveTo(self, x: float, y: float) -> None:
+        self.ops.append(("moveTo", (x, y)))
+
+    def lineTo(self, x: float, y: float) -> None:
+        self.ops.append(("lineTo", (x, y)))
+
+    def curveTo(
+        self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
+    ) -> None:
+        self.ops.append(("curveTo", (x1, y1, x2, y2, x3, y3)))
+
+    def rect(self, x: float, y: float, width: float, height: float) -> None:
+        self.ops.append(("rect", (x, y, width, height)))
+
+    def ellipse(self, x: float, y: float, width: float, height: float) -> None:
+        self.ops.append(("ellipse", (x, y, width, height)))
+
+    def circle(self, x_cen: float, y_cen: float, r: float) -> None:
+        self.ops.append(("circle", (x_cen, y_cen, r)))
+
+    def close(self) -> None:
+        self.ops.append(("close", ()))
+
+    def segments(self) -> List[Op]:
+        """
+        Returns the path expressed only in moveTo, lineTo, curveTo and close, which is all the
+        SVG and PNG canvases need to understand.
+        """
+        segments = []
+        for name, args in self.ops:
+            if name == "rect":
+                x, y, width, height = args
+                segments += [
+                    ("moveTo", (x, y)),
+                    ("lineTo", (x + width, y)),
+                    ("lineTo", (x + width, y + height)),
+                    ("lineTo", (x, y + height)),
+                    ("close", ()),
+                ]
+            elif name in ("ellipse", "circle"):
+                if name == "circle":
+                    x_cen, y_cen, r = args
+                    args = (x_cen - r, y_cen - r, 2 * r, 2 * r)
+                x, y, width, height = args
+                curves = bezierArc(x, y, x + width, y + height, 0, 360)
+                segments.append(("moveTo", tuple(curves[0][:2])))
+                segments += [("curveTo", tuple(curve[2:])) for curve in curves]
+            else:
+                segments.append((name, args))
+        return segments
+
+
+class DisplayList:
+    """
+    Records canvas calls instead of drawing them. A DisplayList implements the part of the
+    reportlab Canvas interface the shapes use, so a shape can be drawn into it once and the
+    recording replayed onto as many canvases as needed (reportlab, NativeCanvas, SVGCanvas,
+    PNGCanvas or another DisplayList).
+    """
+
+    def __init__(self):
+        self.ops: List[Op] = []
+        self._fontname = "Helvetica"
+        self._fontsize = 12
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def stringWidth(
+        self, text: str, fontName: str = None, fontSize: float = None
+    ) -> float:
+        return pdfmetrics.stringWidth(
+            text, fontName or self._fontname, fontSize or self._fontsize
+        )
+
+    def setFont(self, psfontname: str, size: float, leading: float = None) -> None:
+        self._fontname = psfontname
+        self._fontsize = size
+        self.ops.append(("setFont", (psfontname, size, leading)))
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        self.ops.append(("drawString", (x, y, text)))
+
+    def saveState(self) -> None:
+        self.ops.append(("saveState", ()))
+
+    def restoreState(self) -> None:
+        self.ops.append(("restoreState", ()))
+
+    def translate(self, dx: float, dy: float) -> None:
+        self.ops.append(("translate", (dx, dy)))
+
+    def rotate(self, theta: float) -> None:
+        self.ops.append(("rotate", (theta,)))
+
+    def rect(
+        self,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        stroke: int = 1,
+        fill: int = 0,
+    ) -> None:
+        self.ops.append(("rect", (x, y, width, height, stroke, fill)))
+
+    def ellipse(
+        self, x1: float, y1: float, x2: float, y2: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        self.ops.append(("ellipse", (x1, y1, x2, y2, stroke, fill)))
+
+    def circle(
+        self, x_cen: float, y_cen: float, r: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        self.ops.append(("circle", (x_cen, y_cen, r, stroke, fill)))
+
+    def beginPath(self) -> RecordingPath:
+        return RecordingPath()
+
+    def drawPath(self, path: RecordingPath, stroke: int = 1, fill: int = 0) -> None:
+        self.ops.append(("drawPath", (tuple(path.ops), stroke, fill)))
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the recording, for the memory profiler.
+        """
+        return _recorded_size(self.ops)
+
+    def replay(self, canvas: Any, dx: float = 0, dy: float = 0) -> None:
+        """
+        Issues the recorded calls on canvas. When an offset is given the recording is drawn
+        translated by (dx, dy), which is how a layout cached at the origin is placed on a page.
+        """
+        translated = dx != 0 or dy != 0
+        if translated:
+            canvas.saveState()
+            canvas.translate(dx, dy)
+        for name, args in self.ops:
+            if name == "drawPath":
+                path_ops, stroke, fill = args
+                path = canvas.beginPath()
+                for path_name, path_args in path_ops:
+                    getattr(path, path_name)(*path_args)
+                canvas.drawPath(path, stroke, fill)
+            else:
+                getattr(canvas, name)(*args)
+        if translated:
+            canvas.restoreState()
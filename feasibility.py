@@ -0,0 +1,281 @@
+import math
+import os
+import random
+import time
+from typing import Union
+import numpy as np
+from config import fixed_config
+from difficulty import regrouping_counts
+from print import (
+    MAX_BANK_BATCHES,
+    MIN_BANK_BATCH,
+    PROBLEMS_PER_PAGE,
+    build_validator,
+    division_table,
+    evaluate_problem_answer,
+    generate_problem_bank,
+    pack_config,
+    sample_division,
+)
+
+# configs needing more draws than this per problem are flagged as pathologically slow
+SLOW_EXPECTED_DRAWS = 1000
+# carry filtered configs needing more batches than this per page are flagged as slow: they are a
+# tenth of the way to MAX_BANK_BATCHES, where generate_problem_bank gives up, so an unlucky page
+# gets close to it
+SLOW_BANK_BATCHES = MAX_BANK_BATCHES // 10
+CARRY_SAMPLE_SIZE = 200_000
+
+
+def feasible_pair_count(
+    min_number: int,
+    max_number: int,
+    min_answer: int,
+    max_answer: int,
+    operator: str,
+    remainder: Union[bool, None] = None,
+) -> int:
+    """
+    Exact number of (a, b) pairs with both numbers in [min_number, max_number] whose answer is in
+    [min_answer, max_answer]. It counts, for every a at once, the interval of b that works, so it
+    takes one pass over the number range instead of one over all the pairs. For division,
+    remainder=True/False only counts pairs that do/don't leave a remainder.
+    """
+    if min_number > max_number:
+        return 0
+    a = np.arange(min_number, max_number + 1, dtype=np.int64)
+    if operator == "+":
+        b_low, b_high = min_answer - a, max_answer - a
+    elif operator == "-":
+        b_low, b_high = a - max_answer, a - min_answer
+    elif operator == "*":
+        # for negative a dividing the bounds by a flips them
+        positive = np.where(a > 0, a, 1)
+        negative = np.where(a < 0, a, -1)
+        b_low = np.where(
+            a > 0,
+            -(-min_answer // positive),
+            np.where(a < 0, -(-max_answer // negative), min_number),
+        )
+        b_high = np.where(
+            a > 0,
+            max_answer // positive,
+            np.where(a < 0, min_answer // negative, max_number),
+        )
+        if not min_answer <= 0 <= max_answer:
+            # 0 * b == 0 is never a valid answer
+            b_high = np.where(a == 0, b_low - 1, b_high)
+    elif operator == "/":
+        return _feasible_division_count(
+            min_number, max_number, min_answer, max_answer, remainder
+        )
+    else:
+        raise ValueError(f"Invalid operator: {operator}")
+    counts = np.minimum(b_high, max_number) - np.maximum(b_low, min_number) + 1
+    return int(np.clip(counts, 0, None).sum())
+
+
+def _feasible_division_count(
+    min_number: int,
+    max_number: int,
+    min_answer: int,
+    max_answer: int,
+    remainder: Union[bool, None],
+) -> int:
+    # here the loop runs over the divisor: a // b is in [min_answer, max_answer] for a whole
+    # interval of a, and the multiples of b in it are the pairs without a remainder
+    b = np.arange(max(min_number, 1), max_number + 1, dtype=np.int64)
+    a_low = np.maximum(min_number, min_answer * b)
+    a_high = np.minimum(max_number, max_answer * b + b - 1)
+    valid = a_low <= a_high
+    total = np.where(valid, a_high - a_low + 1, 0)
+    multiples = np.where(valid, a_high // b - (-(-a_low // b)) + 1, 0)
+    if remainder is None:
+        return int(total.sum())
+    if remainder:
+        return int((total - multiples).sum())
+    return int(multiples.sum())
+
+
+def analyze_config(config: dict, timing_draws: int = 20000) -> dict:
+    """
+    Works out how well the sampler behind generate_numbers copes with config: the size of the
+    feasible region, the probability that a random draw is accepted, the expected draws per problem
+    and, by timing the real sampler, the projected problems per second. Configs that cannot produce
+    any problem or would need more than SLOW_EXPECTED_DRAWS draws per problem are flagged.
+
+    With MIN_CARRIES/MAX_CARRIES problems come from generate_problem_bank instead: the region left
+    by the carry filter is estimated from a sample, the bank is timed filling pages, and configs
+    are judged by the batches a page needs against MAX_BANK_BATCHES.
+    """
+    operator = config["MATH_OPERATOR"]
+    min_number, max_number = config["MIN_NUMBER"], config["MAX_NUMBER"]
+    min_answer, max_answer = config["MIN_PROBLEM_ANSWER"], config["MAX_PROBLEM_ANSWER"]
+    remainder = config.get("DIVISION_REMAINDER", False)
+    carries = operator != "/" and ("MIN_CARRIES" in config or "MAX_CARRIES" in config)
+    candidates = max(max_number - min_number + 1, 0) ** 2
+    report = {
+        "operator": operator,
+        "candidate_pairs": candidates,
+        "feasible_pairs": feasible_pair_count(
+            min_number,
+            max_number,
+            min_answer,
+            max_answer,
+            operator,
+            remainder if operator == "/" else None,
+        ),
+        "estimated": False,
+        "warnings": [],
+    }
+    rng = random.Random(0)
+    if operator == "/":
+        # division is built from quotient * divisor, every draw is a problem
+        acceptance = 1.0 if report["feasible_pairs"] else 0.0
+        table = division_table(
+            min_number, max_number, min_answer, max_answer, remainder
+        )
+        draw = lambda: sample_division(table, rng)
+    else:
+        acceptance = report["feasible_pairs"] / candidates if candidates else 0.0
+        if carries:
+            carry_acceptance = _estimated_carry_acceptance(config)
+            if carry_acceptance is None:
+                report["warnings"].append(
+                    "The feasible region is too small to estimate the effect of MIN_CARRIES/MAX_CARRIES"
+                )
+            else:
+                acceptance *= carry_acceptance
+                report["feasible_pairs"] = math.ceil(
+                    report["feasible_pairs"] * carry_acceptance
+                )
+                report["estimated"] = True
+        validate = build_validator(config)
+        draw = lambda: validate(
+            rng.randint(min_number, max_number), rng.randint(min_number, max_number)
+        )
+    report["acceptance_probability"] = acceptance
+    report["expected_draws"] = 1 / acceptance if acceptance else float("inf")
+    if carries:
+        _judge_problem_bank(config, report, timing_draws)
+        return report
+
+    if acceptance:
+        start = time.perf_counter()
+        for _ in range(timing_draws):
+            draw()
+        seconds_per_draw = (time.perf_counter() - start) / timing_draws
+        report["problems_per_second"] = 1 / (
+            seconds_per_draw * report["expected_draws"]
+        )
+    else:
+        report["problems_per_second"] = 0.0
+
+    if report["feasible_pairs"] == 0 or acceptance == 0:
+        report["status"] = "infeasible"
+        if operator == "/":
+            report["warnings"].append(
+                "No problem satisfies the configured ranges, sample_division raises ValueError"
+            )
+        else:
+            report["warnings"].append(
+                "No problem satisfies the configured ranges, generate_numbers would never return"
+            )
+    elif report["expected_draws"] > SLOW_EXPECTED_DRAWS:
+        report["status"] = "slow"
+        report["warnings"].append(
+            f"Every problem needs about {report['expected_draws']:.0f} draws, widen MIN_PROBLEM_ANSWER/MAX_PROBLEM_ANSWER or narrow MIN_NUMBER/MAX_NUMBER"
+        )
+    else:
+        report["status"] = "ok"
+    return report
+
+
+def _judge_problem_bank(config: dict, report: dict, timing_draws: int) -> None:
+    # a page is one bank of PROBLEMS_PER_PAGE problems, drawn in batches of batch candidates
+    batch = max(PROBLEMS_PER_PAGE, MIN_BANK_BATCH)
+    acceptance = report["acceptance_probability"]
+    report["expected_batches"] = (
+        PROBLEMS_PER_PAGE / (batch * acceptance) if acceptance else float("inf")
+    )
+    report["problems_per_second"] = 0.0
+    if report["expected_batches"] > MAX_BANK_BATCHES:
+        report["status"] = "infeasible"
+        report["warnings"].append(
+            f"A page needs about {report['expected_batches']:.0f} batches, generate_problem_bank gives up after {MAX_BANK_BATCHES}"
+        )
+        return
+
+    # the bank reads its config from a path, the analyzed config may not be in a file
+    config_path = fixed_config(pack_config(config), os.getcwd())
+    rng = random.Random(0)
+    pages = max(timing_draws // batch, 1)
+    start = time.perf_counter()
+    try:
+        for _ in range(pages):
+            generate_problem_bank(
+                PROBLEMS_PER_PAGE,
+                rng,
+                config.get("MIN_CARRIES"),
+                config.get("MAX_CARRIES"),
+                config_path,
+            )
+    except ValueError as e:
+        report["status"] = "infeasible"
+        report["warnings"].append(str(e))
+        return
+    report["problems_per_second"] = (
+        PROBLEMS_PER_PAGE * pages / (time.perf_counter() - start)
+    )
+    if report["expected_batches"] > SLOW_BANK_BATCHES:
+        report["status"] = "slow"
+        report["warnings"].append(
+            f"A page needs about {report['expected_batches']:.0f} batches, close to the {MAX_BANK_BATCHES} generate_problem_bank gives up after. Relax MIN_CARRIES/MAX_CARRIES or the ranges"
+        )
+    else:
+        report["status"] = "ok"
+
+
+def _estimated_carry_acceptance(config: dict) -> Union[float, None]:
+    # the carry filter has no closed form, so it is estimated on a sample of the feasible pairs
+    operator = config["MATH_OPERATOR"]
+    np_rng = np.random.default_rng(0)
+    a = np_rng.integers(
+        config["MIN_NUMBER"], config["MAX_NUMBER"] + 1, CARRY_SAMPLE_SIZE
+    )
+    b = np_rng.integers(
+        config["MIN_NUMBER"], config["MAX_NUMBER"] + 1, CARRY_SAMPLE_SIZE
+    )
+    answers = evaluate_problem_answer(a, b, operator)
+    feasible = (answers >= config["MIN_PROBLEM_ANSWER"]) & (
+        answers <= config["MAX_PROBLEM_ANSWER"]
+    )
+    if not feasible.any():
+        return None
+    carries = regrouping_counts(a[feasible], b[feasible], operator)
+    keep = np.ones(carries.shape, dtype=bool)
+    if "MIN_CARRIES" in config:
+        keep &= carries >= config["MIN_CARRIES"]
+    if "MAX_CARRIES" in config:
+        keep &= carries <= config["MAX_CARRIES"]
+    return float(keep.mean())
+
+
+def format_report(report: dict) -> str:
+    approximately = "~" if report["estimated"] else ""
+    lines = [
+        f"operator:               {report['operator']}",
+        f"candidate pairs:        {report['candidate_pairs']}",
+        f"feasible pairs:         {approximately}{report['feasible_pairs']}",
+        f"acceptance probability: {approximately}{report['acceptance_probability']:.6g}",
+        f"expected draws/problem: {approximately}{report['expected_draws']:.6g}",
+        f"projected problems/s:   {report['problems_per_second']:,.2f}",
+        *(
+            [f"expected batches/page:  {approximately}{report['expected_batches']:.6g}"]
+            if "expected_batches" in report
+            else []
+        ),
+        f"status:                 {report['status']}",
+    ]
+    lines += [f"warning: {warning}" for warning in report["warnings"]]
+    return "\n".join(lines)
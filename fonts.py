@@ -0,0 +1,78 @@
+import os
+from functools import lru_cache
+from typing import Dict, Union
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from native_canvas import STANDARD_FONTS
+
+# the characters of a problem, their widths are looked up once per font instead of asking
+# reportlab for every string (which is slow for TrueType fonts)
+METRIC_CHARACTERS = "0123456789+-*/=?() "
+
+# font name -> TrueType file and back, for every font register_font loaded in this process
+_font_files: Dict[str, str] = {}
+_font_names: Dict[str, str] = {}
+
+
+def register_font(font: str, base_dir: Union[str, None] = None) -> str:
+    """
+    Makes font usable on every canvas and returns its font name. font is the name of a standard
+    PDF font (e.g. "Helvetica") or the path to a .ttf file, relative to base_dir (the working
+    directory by default). A file is registered with reportlab the first time it is seen in this
+    process, under the file's name, or the file's name with a number appended when a different
+    file of the same name was registered first. reportlab embeds a subset of a TrueType font once
+    per document, shared by all of its pages.
+    """
+    if font in STANDARD_FONTS or font in _font_files:
+        return font
+    if not font.lower().endswith(".ttf"):
+        raise ValueError(
+            f"Invalid font: {font}. Must be a .ttf file or one of {list(STANDARD_FONTS)}"
+        )
+    path = os.path.abspath(os.path.join(base_dir or os.getcwd(), font))
+    if path in _font_names:
+        return _font_names[path]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name, number = stem, 1
+    while name in _font_files or name in STANDARD_FONTS:
+        number += 1
+        name = f"{stem}-{number}"
+    pdfmetrics.registerFont(TTFont(name, path))
+    _font_files[name] = path
+    _font_names[path] = name
+    return name
+
+
+def font_file(font_name: str) -> Union[str, None]:
+    """
+    The TrueType file behind a registered font, None for the standard fonts.
+    """
+    return _font_files.get(font_name)
+
+
+class FontMetrics:
+    """
+    Advance widths of the characters in METRIC_CHARACTERS for a font, in 1/1000 of the font size
+    like the font files store them. Strings made of those characters are measured with a dict
+    lookup per character, anything else falls back to reportlab.
+    """
+
+    def __init__(self, name: str, size: float):
+        self.name = name
+        self.size = size
+        self.widths = {
+            character: pdfmetrics.stringWidth(character, name, 1000)
+            for character in METRIC_CHARACTERS
+        }
+
+    def string_width(self, text: str) -> float:
+        widths = self.widths
+        try:
+            return sum(widths[character] for character in text) * 0.001 * self.size
+        except KeyError:
+            return pdfmetrics.stringWidth(text, self.name, self.size)
+
+
+@lru_cache(maxsize=64)
+def font_metrics(name: str, size: float) -> FontMetrics:
+    return FontMetrics(name, size)
@@ -0,0 +1,176 @@
+import os
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Union
+
+# per thread (and asyncio task), so shapes rendered by other threads of a pool are not attributed
+# to the profiler of the page being rendered here
+_active_profiler: ContextVar[Union["MemoryProfiler", None]] = ContextVar(
+    "active_profiler", default=None
+)
+
+
+class MemoryGrowthError(RuntimeError):
+    pass
+
+
+def rss_bytes() -> Union[int, None]:
+    """
+    Current resident set size of this process, None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def active_profiler() -> Union["MemoryProfiler", None]:
+    """
+    The profiler recording the page being rendered right now, if any. ShapeFactory uses it to
+    attribute allocations to shape classes without threading the profiler through every call.
+    """
+    return _active_profiler.get()
+
+
+class MemoryProfiler:
+    """
+    Opt-in memory instrumentation for long renders. Used as a context manager it traces
+    allocations with tracemalloc; render_addition_pdf then records the traced memory and RSS growth
+    of every page and ShapeFactory the growth per shape class.
+
+    Growth that is expected to accumulate is accounted for separately: memory allocated inside an
+    expected() block, and structures whose size is reported by a function registered with track()
+    (e.g. the content streams the canvas keeps until it is saved, or the shape layout cache filling
+    up). When max_growth_per_page (bytes) is given, MemoryGrowthError is raised as soon as
+    the average of the remaining growth per page since the end of the warmup pages exceeds it,
+    judged once at least min_pages pages past the warmup have been measured.
+    """
+
+    def __init__(
+        self,
+        max_growth_per_page: Union[int, None] = None,
+        warmup_pages: int = 5,
+        min_pages: int = 20,
+    ):
+        self.max_growth_per_page = max_growth_per_page
+        self.warmup_pages = warmup_pages
+        self.min_pages = min_pages
+        self.pages: List[Dict[str, int]] = []
+        self.shapes: Dict[str, Dict[str, int]] = {}
+        self.expected_growth: Dict[str, int] = {}
+        self.tracked: Dict[str, Callable[[], int]] = {}
+        self._expected_total = 0
+        self._started_tracing = False
+
+    def __enter__(self) -> "MemoryProfiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def page(self, page_number: int) -> Iterator[None]:
+        traced_before, _ = tracemalloc.get_traced_memory()
+        unexpected_before = (
+            traced_before
+            - self._expected_total
+            - sum(size() for size in self.tracked.values())
+        )
+        rss_before = rss_bytes()
+        token = _active_profiler.set(self)
+        try:
+            yield
+        finally:
+            _active_profiler.reset(token)
+        traced, _ = tracemalloc.get_traced_memory()
+        rss = rss_bytes()
+        tracked = {category: size() for category, size in self.tracked.items()}
+        self.pages.append(
+            {
+                "page": page_number,
+                "traced": traced,
+                "traced_delta": traced - traced_before,
+                "tracked": tracked,
+                # traced memory without the expected growth so far
+                "unexpected": traced - self._expected_total - sum(tracked.values()),
+                "unexpected_before": unexpected_before,
+                "rss": rss,
+                "rss_delta": None if rss is None else rss - rss_before,
+            }
+        )
+        self.check()
+
+    @contextmanager
+    def shape(self, shape_class: str) -> Iterator[None]:
+        traced_before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            traced, _ = tracemalloc.get_traced_memory()
+            totals = self.shapes.setdefault(
+                shape_class, {"calls": 0, "traced_delta": 0}
+            )
+            totals["calls"] += 1
+            totals["traced_delta"] += traced - traced_before
+
+    def track(self, category: str, size: Callable[[], int]) -> None:
+        self.tracked[category] = size
+
+    @contextmanager
+    def expected(self, category: str) -> Iterator[None]:
+        traced_before, _ = tracemalloc.get_traced_memory()
+        yield
+        traced, _ = tracemalloc.get_traced_memory()
+        self.expected_growth[category] = (
+            self.expected_growth.get(category, 0) + traced - traced_before
+        )
+        self._expected_total += traced - traced_before
+
+    def growth_per_page(self) -> Union[float, None]:
+        """
+        Average traced memory growth per page after the warmup pages, not counting the expected
+        growth. None until min_pages pages past the warmup have been measured.
+        """
+        measured_pages = len(self.pages) - self.warmup_pages
+        if measured_pages <= 0 or measured_pages < self.min_pages:
+            return None
+        baseline = self.pages[self.warmup_pages]["unexpected_before"]
+        return (self.pages[-1]["unexpected"] - baseline) / measured_pages
+
+    def check(self) -> None:
+        growth = self.growth_per_page()
+        if (
+            self.max_growth_per_page is not None
+            and growth is not None
+            and growth > self.max_growth_per_page
+        ):
+            raise MemoryGrowthError(
+                f"Memory grew by {growth:.0f} bytes per page over {len(self.pages) - self.warmup_pages} pages, more than the allowed {self.max_growth_per_page}"
+            )
+
+    def summary(self) -> str:
+        growth = self.growth_per_page()
+        lines = [
+            f"pages:           {len(self.pages)}",
+            f"growth per page: {'n/a' if growth is None else f'{growth:.0f} bytes'}",
+        ]
+        if self.pages and self.pages[-1]["rss"] is not None:
+            lines.append(f"rss:             {self.pages[-1]['rss']} bytes")
+        for category, growth in sorted(self.expected_growth.items()):
+            lines.append(f"{category:>17}: {growth} bytes expected growth")
+        for category, size in sorted(
+            self.pages[-1]["tracked"].items() if self.pages else []
+        ):
+            lines.append(f"{category:>17}: {size} bytes tracked")
+        for shape_class, totals in sorted(self.shapes.items()):
+            lines.append(
+                f"{shape_class:>17}: {totals['calls']} calls, {totals['traced_delta']} bytes retained"
+            )
+        return "\n".join(lines)
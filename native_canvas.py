@@ -0,0 +1,252 @@
+import zlib
+from typing import BinaryIO, List, Tuple, Union
+from reportlab.lib.rl_accel import fp_str, escapePDF
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.pdfgeom import bezierArc
+from math import cos, sin, pi
+
+# The standard 14 Type1 fonts every PDF viewer ships with, so they never need embedding.
+STANDARD_FONTS = (
+    "Courier",
+    "Courier-Bold",
+    "Courier-BoldOblique",
+    "Courier-Oblique",
+    "Helvetica",
+    "Helvetica-Bold",
+    "Helvetica-BoldOblique",
+    "Helvetica-Oblique",
+    "Times-Roman",
+    "Times-Bold",
+    "Times-BoldItalic",
+    "Times-Italic",
+    "Symbol",
+    "ZapfDingbats",
+)
+
+
+class NativePath:
+    """
+    Minimal stand-in for reportlab's PDFPathObject. Collects path construction operators
+    which NativeCanvas.drawPath writes to the page content stream.
+    """
+
+    def __init__(self):
+        self._code = ["n"]
+
+    def moveTo(self, x: float, y: float) -> None:
+        self._code.append(f"{fp_str(x, y)} m")
+
+    def lineTo(self, x: float, y: float) -> None:
+        self._code.append(f"{fp_str(x, y)} l")
+
+    def curveTo(
+        self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
+    ) -> None:
+        self._code.append(f"{fp_str(x1, y1, x2, y2, x3, y3)} c")
+
+    def rect(self, x: float, y: float, width: float, height: float) -> None:
+        self._code.append(f"{fp_str(x, y, width, height)} re")
+
+    def ellipse(self, x: float, y: float, width: float, height: float) -> None:
+        # same bezier approximation reportlab uses, so the curves are identical
+        curves = bezierArc(x, y, x + width, y + height, 0, 360)
+        self.moveTo(*curves[0][:2])
+        for curve in curves:
+            self.curveTo(*curve[2:])
+
+    def circle(self, x_cen: float, y_cen: float, r: float) -> None:
+        self.ellipse(x_cen - r, y_cen - r, 2 * r, 2 * r)
+
+    def close(self) -> None:
+        self._code.append("h")
+
+    def getCode(self) -> str:
+        return " ".join(self._code)
+
+
+class NativeCanvas:
+    """
+    Lightweight PDF writer for the small set of primitives the shapes use (circle, ellipse, rect,
+    paths, translate/rotate and drawString in the standard Type1 fonts). Content stream operators
+    are written straight into a buffer instead of going through reportlab's general purpose canvas.
+    It implements the subset of the reportlab Canvas interface that MathProblemShape and print.py
+    rely on, so it can be passed anywhere a Canvas is expected.
+    """
+
+    def __init__(
+        self,
+        filename: Union[str, BinaryIO],
+        pagesize: Tuple[float, float],
+        pageCompression: bool = True,
+    ):
+        self._filename = filename
+        self._pagesize = pagesize
+        self._page_compression = pageCompression
+        self._fonts: List[str] = []
+        self._pages: List[bytes] = []
+        self._code: List[str] = []
+        self._fontname = "Helvetica"
+        self._fontsize = 12
+        # the font saveState saved, restoreState sets it back like reportlab's Canvas does
+        self._state_stack: List[Tuple[str, float]] = []
+        self._keywords: Union[str, None] = None
+
+    def _font_ref(self, fontname: str) -> str:
+        if fontname not in STANDARD_FONTS:
+            raise ValueError(
+                f"NativeCanvas only supports the standard Type1 fonts, got {fontname}"
+            )
+        if fontname not in self._fonts:
+            self._fonts.append(fontname)
+        return f"/F{self._fonts.index(fontname) + 1}"
+
+    def stringWidth(
+        self, text: str, fontName: str = None, fontSize: float = None
+    ) -> float:
+        return pdfmetrics.stringWidth(
+            text, fontName or self._fontname, fontSize or self._fontsize
+        )
+
+    def setFont(self, psfontname: str, size: float, leading: float = None) -> None:
+        self._fontname = psfontname
+        self._fontsize = size
+        font_ref = self._font_ref(psfontname)
+        self._code.append(
+            f"BT {font_ref} {fp_str(size)} Tf {fp_str(leading or size * 1.2)} TL ET"
+        )
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        self._code.append(f"BT 1 0 0 1 {fp_str(x, y)} Tm ({escapePDF(text)}) Tj ET")
+
+    def saveState(self) -> None:
+        self._state_stack.append((self._fontname, self._fontsize))
+        self._code.append("q")
+
+    def restoreState(self) -> None:
+        self._code.append("Q")
+        self._fontname, self._fontsize = self._state_stack.pop()
+
+    def translate(self, dx: float, dy: float) -> None:
+        self._code.append(f"1 0 0 1 {fp_str(dx, dy)} cm")
+
+    def rotate(self, theta: float) -> None:
+        c = cos(theta * pi / 180)
+        s = sin(theta * pi / 180)
+        self._code.append(f"{fp_str(c, s, -s, c, 0, 0)} cm")
+
+    def beginPath(self) -> NativePath:
+        return NativePath()
+
+    def drawPath(self, path: NativePath, stroke: int = 1, fill: int = 0) -> None:
+        self._code.append(path.getCode())
+        self._code.append(_path_op(stroke, fill))
+
+    def rect(
+        self,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        stroke: int = 1,
+        fill: int = 0,
+    ) -> None:
+        self._code.append(
+            f"n {fp_str(x, y, width, height)} re {_path_op(stroke, fill)}"
+        )
+
+    def ellipse(
+        self, x1: float, y1: float, x2: float, y2: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        path = NativePath()
+        path.ellipse(x1, y1, x2 - x1, y2 - y1)
+        self.drawPath(path, stroke, fill)
+
+    def circle(
+        self, x_cen: float, y_cen: float, r: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        self.ellipse(x_cen - r, y_cen - r, x_cen + r, y_cen + r, stroke, fill)
+
+    def setKeywords(self, keywords: str) -> None:
+        self._keywords = keywords
+
+    def content_bytes(self) -> int:
+        """
+        Size of the content streams of the pages shown so far, which are held until the document
+        is saved.
+        """
+        return sum(len(content) for content in self._pages)
+
+    def showPage(self) -> None:
+        self._pages.append("\n".join(self._code).encode("latin-1"))
+        self._code = []
+
+    def getpdfdata(self) -> bytes:
+        if self._code:
+            self.showPage()
+        width, height = self._pagesize
+        # object layout: 1 catalog, 2 pages, 3 font resources, one object per font,
+        # then a (page, content stream) pair for every page and the info dict if there are keywords
+        first_page_obj = 4 + len(self._fonts)
+        page_refs = " ".join(
+            f"{first_page_obj + 2 * i} 0 R" for i in range(len(self._pages))
+        )
+        font_refs = " ".join(f"/F{i + 1} {4 + i} 0 R" for i in range(len(self._fonts)))
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Count {len(self._pages)} /Kids [ {page_refs} ] >>".encode(),
+            f"<< {font_refs} >>".encode(),
+        ]
+        for i, fontname in enumerate(self._fonts):
+            objects.append(
+                f"<< /Type /Font /Subtype /Type1 /Name /F{i + 1} /BaseFont /{fontname} "
+                f"/Encoding /WinAnsiEncoding >>".encode()
+            )
+        for i, content in enumerate(self._pages):
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 {fp_str(width, height)} ] "
+                f"/Resources << /Font 3 0 R /ProcSet [ /PDF /Text ] >> "
+                f"/Contents {first_page_obj + 2 * i + 1} 0 R >>".encode()
+            )
+            if self._page_compression:
+                content = zlib.compress(content)
+                header = f"<< /Length {len(content)} /Filter /FlateDecode >>"
+            else:
+                header = f"<< /Length {len(content)} >>"
+            objects.append(header.encode() + b"\nstream\n" + content + b"\nendstream")
+        info = ""
+        if self._keywords is not None:
+            objects.append(f"<< /Keywords ({escapePDF(self._keywords)}) >>".encode())
+            info = f" /Info {len(objects)} 0 R"
+
+        out = bytearray(b"%PDF-1.3\n%\x93\x8c\x8b\x9e\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref_offset = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode()
+        out += (
+            f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R{info} >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        return bytes(out)
+
+    def save(self) -> None:
+        data = self.getpdfdata()
+        if isinstance(self._filename, str):
+            with open(self._filename, "wb") as f:
+                f.write(data)
+        else:
+            self._filename.write(data)
+
+
+def _path_op(stroke: int, fill: int) -> str:
+    if stroke and fill:
+        return "B"
+    if fill:
+        return "f"
+    if stroke:
+        return "S"
+    return "n"
@@ -0,0 +1,133 @@
+import io
+import json
+import random
+from typing import List, Set, Tuple, Union
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from async_writer import write_file
+from config import fixed_config
+from print import (
+    BACKENDS,
+    PACK_KEYWORDS_PREFIX,
+    PROBLEMS_PER_PAGE,
+    generate_math_problems,
+    generate_page,
+    pack_keywords,
+    page_rng,
+)
+from utils import SingleProblemMathProperties
+
+# draws of a problem that is already in the pack before concluding the config has no new ones
+MAX_REDRAWS = 1000
+
+ProblemKey = Tuple[int, int, str]
+
+
+def read_pack_metadata(reader: PdfReader) -> dict:
+    keywords = (reader.metadata or {}).get("/Keywords") or ""
+    if not keywords.startswith(PACK_KEYWORDS_PREFIX):
+        raise ValueError(
+            "The PDF has no pack metadata, it was not generated by print.py"
+        )
+    return json.loads(keywords[len(PACK_KEYWORDS_PREFIX) :])
+
+
+def problem_key(problem: SingleProblemMathProperties) -> ProblemKey:
+    return problem.a, problem.b, problem.operator
+
+
+def page_problems(
+    seed: int,
+    page_number: int,
+    seen: Union[Set[ProblemKey], None] = None,
+    config_path: Union[str, None] = None,
+) -> Tuple[random.Random, List[SingleProblemMathProperties]]:
+    """
+    The problems of a page of a seeded pack, and the page's generator in the state the rest of the
+    page is drawn with. With seen, problems already in seen are redrawn and the page's problems are
+    added to it.
+    """
+    rng = page_rng(seed, page_number)
+    math_problems = generate_math_problems(PROBLEMS_PER_PAGE, rng, config_path)
+    if seen is None:
+        return rng, math_problems
+    for i, problem in enumerate(math_problems):
+        for _ in range(MAX_REDRAWS):
+            if problem_key(problem) not in seen:
+                break
+            problem = generate_math_problems(1, rng, config_path)[0]
+        else:
+            raise ValueError(
+                f"Found no new problem in {MAX_REDRAWS} draws, the config allows too few problems to append more pages"
+            )
+        math_problems[i] = problem
+        seen.add(problem_key(problem))
+    return rng, math_problems
+
+
+def pack_problem_keys(
+    seed: int, segments: List[int], config_path: Union[str, None] = None
+) -> Set[ProblemKey]:
+    """
+    Regenerates the problems of every page of a pack from its seed without drawing anything. The
+    pages of the original pack are plain seeded pages, appended pages were deduplicated against
+    everything before them and are regenerated the same way.
+    """
+    seen: Set[ProblemKey] = set()
+    page_number = 0
+    for segment, pages in enumerate(segments):
+        for _ in range(pages):
+            _, math_problems = page_problems(
+                seed, page_number, seen if segment else None, config_path
+            )
+            seen.update(problem_key(problem) for problem in math_problems)
+            page_number += 1
+    return seen
+
+
+def append_pages(path: str, pages: int) -> int:
+    """
+    Appends pages with problems that are not in the pack yet to the pack at path and returns the
+    new page count. Only the new pages are rendered, the existing ones are copied over as they are.
+    Finding the existing problems means regenerating them from the pack's seed, which is a small
+    fraction of the cost of rendering them.
+
+    The pack has to be seeded. Everything is generated with the config stored in the pack, not the
+    current one, so the new pages are drawn like the existing ones.
+    """
+    reader = PdfReader(path)
+    metadata = read_pack_metadata(reader)
+    seed, segments = metadata["seed"], metadata["segments"]
+    if seed is None:
+        raise ValueError(
+            f"{path} was generated without a seed, pages can't be appended"
+        )
+    config_path = fixed_config(metadata["config"], metadata["config_dir"])
+    first_page = sum(segments)
+    if len(reader.pages) != first_page:
+        raise ValueError(
+            f"{path} has {len(reader.pages)} pages but was generated with {first_page}"
+        )
+
+    seen = pack_problem_keys(seed, segments, config_path)
+    buffer = io.BytesIO()
+    c = BACKENDS[metadata["backend"]](buffer, pagesize=A4)
+    for page_number in range(first_page, first_page + pages):
+        rng, math_problems = page_problems(seed, page_number, seen, config_path)
+        generate_page(c, rng, math_problems, config_path=config_path)
+    c.save()
+
+    writer = PdfWriter(clone_from=reader)
+    for page in PdfReader(buffer).pages:
+        writer.add_page(page)
+    writer.add_metadata(
+        {
+            "/Keywords": pack_keywords(
+                seed, segments + [pages], metadata["backend"], config_path
+            )
+        }
+    )
+    merged = io.BytesIO()
+    writer.write(merged)
+    write_file(path, merged.getvalue())
+    return first_page + pages
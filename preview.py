@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, Tuple, Union
+from reportlab.lib.pagesizes import A4
+from config import config_cache
+from preview_canvas import PNGCanvas
+from print import load_config, pack_config, seeded_page
+
+# pixels per point of the thumbnails, 0.25 renders an A4 page at 149x210 pixels
+PREVIEW_SCALE = 0.25
+
+
+def preview_spec(
+    seed: int,
+    pages: int,
+    scale: float = PREVIEW_SCALE,
+    config_path: Union[str, None] = None,
+) -> dict:
+    """
+    Everything that determines what the preview of a pack looks like. Two packs with the same spec
+    produce the same pages, so the spec hash is used as the thumbnail cache key. The pages are
+    rendered from the config file the spec was made with, which has to be unchanged by then.
+    """
+    return {
+        "seed": seed,
+        "pages": pages,
+        "scale": scale,
+        "config_path": config_cache(config_path).path,
+        "config": pack_config(load_config(config_path)),
+    }
+
+
+def spec_hash(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def render_preview_page(spec: dict, page_number: int) -> bytes:
+    """
+    Renders a single page of a seeded pack straight to a PNG, without producing a PDF. Pages are
+    independent of each other (see page_rng), which is what lets them render in parallel. The
+    layout comes from seeded_page, so printing the pack in this process doesn't lay it out again.
+
+    The page is laid out with the spec's config file rather than the process's config, which worker
+    processes don't share with the process that made the spec. Raises ValueError when the file no
+    longer holds the spec's config, the page would be cached under a hash that doesn't describe it.
+    """
+    config_path = spec["config_path"]
+    if pack_config(load_config(config_path)) != spec["config"]:
+        raise ValueError(f"{config_path} changed since the preview spec was made")
+    canvas = PNGCanvas(A4, scale=spec["scale"])
+    seeded_page(spec["seed"], page_number, config_path).replay(canvas)
+    canvas.showPage()
+    return canvas.pages[0]
+
+
+class PreviewRenderer:
+    """
+    Renders and caches page thumbnails of a pack. Thumbnails are kept in memory and, when cache_dir
+    is given, on disk under cache_dir/<spec hash>/<page>.png so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, None] = None,
+        executor: Union[Executor, None] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.executor = executor
+        self._cache: Dict[Tuple[str, int], bytes] = {}
+
+    def _cache_path(self, key: str, page_number: int) -> str:
+        return os.path.join(self.cache_dir, key, f"{page_number}.png")
+
+    def _cached(self, key: str, page_number: int) -> Union[bytes, None]:
+        if (key, page_number) in self._cache:
+            return self._cache[(key, page_number)]
+        if self.cache_dir is None:
+            return None
+        path = self._cache_path(key, page_number)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            png = f.read()
+        self._cache[(key, page_number)] = png
+        return png
+
+    def _store(self, key: str, page_number: int, png: bytes) -> None:
+        self._cache[(key, page_number)] = png
+        if self.cache_dir is None:
+            return
+        path = self._cache_path(key, page_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so a concurrent reader never sees half a png
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(png)
+        os.replace(f"{path}.tmp", path)
+
+    def page(self, spec: dict, page_number: int) -> bytes:
+        key = spec_hash(spec)
+        png = self._cached(key, page_number)
+        if png is None:
+            png = render_preview_page(spec, page_number)
+            self._store(key, page_number, png)
+        return png
+
+    def pages(self, spec: dict) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yields (page number, png) in page order. The first page is rendered in this process so it
+        is available immediately; the remaining uncached pages are rendered in parallel.
+        """
+        key = spec_hash(spec)
+        if spec["pages"] == 0:
+            return
+        yield 0, self.page(spec, 0)
+        missing = [
+            page_number
+            for page_number in range(1, spec["pages"])
+            if self._cached(key, page_number) is None
+        ]
+        executor = self.executor
+        if executor is None and missing:
+            executor = ProcessPoolExecutor()
+        try:
+            futures = {
+                page_number: executor.submit(render_preview_page, spec, page_number)
+                for page_number in missing
+            }
+            for page_number in range(1, spec["pages"]):
+                if page_number in futures:
+                    self._store(key, page_number, futures[page_number].result())
+                yield page_number, self._cached(key, page_number)
+        finally:
+            if self.executor is None and executor is not None:
+                executor.shutdown(cancel_futures=True)
@@ -0,0 +1,244 @@
+import io
+import os
+from functools import lru_cache
+from math import cos, sin, pi
+from typing import List, Tuple, Union
+from xml.sax.saxutils import escape
+import reportlab
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.pdfbase import pdfmetrics
+from display_list import RecordingPath
+from fonts import font_file
+
+# PDF transformation matrix (a, b, c, d, e, f)
+Matrix = Tuple[float, float, float, float, float, float]
+IDENTITY: Matrix = (1, 0, 0, 1, 0, 0)
+
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    # same composition reportlab's Canvas.transform uses: n is applied first, then m
+    a0, b0, c0, d0, e0, f0 = m
+    a, b, c, d, e, f = n
+    return (
+        a0 * a + c0 * b,
+        b0 * a + d0 * b,
+        a0 * c + c0 * d,
+        b0 * c + d0 * d,
+        a0 * e + c0 * f + e0,
+        b0 * e + d0 * f + f0,
+    )
+
+
+def apply(m: Matrix, x: float, y: float) -> Tuple[float, float]:
+    a, b, c, d, e, f = m
+    return a * x + c * y + e, b * x + d * y + f
+
+
+class _TransformingCanvas:
+    """
+    Shared graphics state for canvases that are not PDF: keeps track of the current transformation
+    matrix and font across saveState/restoreState, and reduces every shape primitive to a path.
+    """
+
+    def __init__(self, pagesize: Tuple[float, float]):
+        self.pagesize = pagesize
+        self._matrix: Matrix = IDENTITY
+        self._stack: List[Tuple[Matrix, str, float]] = []
+        self._fontname = "Helvetica"
+        self._fontsize = 12
+
+    def stringWidth(
+        self, text: str, fontName: str = None, fontSize: float = None
+    ) -> float:
+        return pdfmetrics.stringWidth(
+            text, fontName or self._fontname, fontSize or self._fontsize
+        )
+
+    def setFont(self, psfontname: str, size: float, leading: float = None) -> None:
+        self._fontname = psfontname
+        self._fontsize = size
+
+    def saveState(self) -> None:
+        self._stack.append((self._matrix, self._fontname, self._fontsize))
+
+    def restoreState(self) -> None:
+        self._matrix, self._fontname, self._fontsize = self._stack.pop()
+
+    def translate(self, dx: float, dy: float) -> None:
+        self._matrix = multiply(self._matrix, (1, 0, 0, 1, dx, dy))
+
+    def rotate(self, theta: float) -> None:
+        c = cos(theta * pi / 180)
+        s = sin(theta * pi / 180)
+        self._matrix = multiply(self._matrix, (c, s, -s, c, 0, 0))
+
+    def beginPath(self) -> RecordingPath:
+        return RecordingPath()
+
+    def rect(
+        self,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        stroke: int = 1,
+        fill: int = 0,
+    ) -> None:
+        path = RecordingPath()
+        path.rect(x, y, width, height)
+        self.drawPath(path, stroke, fill)
+
+    def ellipse(
+        self, x1: float, y1: float, x2: float, y2: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        path = RecordingPath()
+        path.ellipse(x1, y1, x2 - x1, y2 - y1)
+        self.drawPath(path, stroke, fill)
+
+    def circle(
+        self, x_cen: float, y_cen: float, r: float, stroke: int = 1, fill: int = 0
+    ) -> None:
+        self.ellipse(x_cen - r, y_cen - r, x_cen + r, y_cen + r, stroke, fill)
+
+    def drawPath(self, path: RecordingPath, stroke: int = 1, fill: int = 0) -> None:
+        raise NotImplementedError("drawPath method not implemented")
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        raise NotImplementedError("drawString method not implemented")
+
+
+class SVGCanvas(_TransformingCanvas):
+    """
+    Renders canvas calls to one SVG document per page, for the web preview.
+    """
+
+    def __init__(self, pagesize: Tuple[float, float]):
+        super().__init__(pagesize)
+        self._elements: List[str] = []
+        self.pages: List[str] = []
+
+    def _point(self, x: float, y: float) -> str:
+        x, y = apply(self._matrix, x, y)
+        # svg has its origin at the top left, pdf at the bottom left
+        return f"{x:.2f} {self.pagesize[1] - y:.2f}"
+
+    def drawPath(self, path: RecordingPath, stroke: int = 1, fill: int = 0) -> None:
+        commands = {"moveTo": "M", "lineTo": "L", "curveTo": "C", "close": "Z"}
+        d = []
+        for name, args in path.segments():
+            points = [self._point(args[i], args[i + 1]) for i in range(0, len(args), 2)]
+            d.append(" ".join([commands[name]] + points))
+        self._elements.append(
+            f'<path d="{" ".join(d)}" fill="{"black" if fill else "none"}" '
+            f'stroke="{"black" if stroke else "none"}"/>'
+        )
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        x, y = self._point(x, y).split()
+        self._elements.append(
+            f'<text x="{x}" y="{y}" font-family="{self._fontname}" '
+            f'font-size="{self._fontsize}">{escape(text)}</text>'
+        )
+
+    def showPage(self) -> None:
+        width, height = self.pagesize
+        self.pages.append(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.2f}" '
+            f'height="{height:.2f}" viewBox="0 0 {width:.2f} {height:.2f}">'
+            f'<rect width="100%" height="100%" fill="white"/>'
+            f"{''.join(self._elements)}</svg>"
+        )
+        self._elements = []
+        self._matrix = IDENTITY
+        self._stack = []
+
+
+@lru_cache(maxsize=16)
+def preview_font(
+    size: int, font_path: Union[str, None] = None
+) -> ImageFont.FreeTypeFont:
+    # TrueType fonts are drawn with their own file. Vera ships with reportlab and is close
+    # enough to the standard fonts for a thumbnail
+    if font_path is None:
+        font_path = os.path.join(
+            os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf"
+        )
+    return ImageFont.truetype(font_path, max(size, 1))
+
+
+class PNGCanvas(_TransformingCanvas):
+    """
+    Rasterizes canvas calls with Pillow, one PNG per page. scale is the number of pixels per
+    point, so scale=1 renders an A4 page at 595x842 pixels.
+    """
+
+    CURVE_STEPS = 12
+
+    def __init__(self, pagesize: Tuple[float, float], scale: float = 1.0):
+        super().__init__(pagesize)
+        self.scale = scale
+        self.pages: List[bytes] = []
+        self._new_image()
+
+    def _new_image(self) -> None:
+        width, height = self.pagesize
+        self._image = Image.new(
+            "L", (round(width * self.scale), round(height * self.scale)), 255
+        )
+        self._draw = ImageDraw.Draw(self._image)
+
+    def _pixel(self, x: float, y: float) -> Tuple[float, float]:
+        x, y = apply(self._matrix, x, y)
+        return x * self.scale, (self.pagesize[1] - y) * self.scale
+
+    def drawPath(self, path: RecordingPath, stroke: int = 1, fill: int = 0) -> None:
+        polylines: List[List[Tuple[float, float]]] = []
+        current = (0.0, 0.0)
+        for name, args in path.segments():
+            if name == "moveTo":
+                current = args
+                polylines.append([self._pixel(*current)])
+            elif name == "lineTo":
+                current = args
+                polylines[-1].append(self._pixel(*current))
+            elif name == "curveTo":
+                x0, y0 = current
+                x1, y1, x2, y2, x3, y3 = args
+                for step in range(1, self.CURVE_STEPS + 1):
+                    t = step / self.CURVE_STEPS
+                    u = 1 - t
+                    polylines[-1].append(
+                        self._pixel(
+                            u**3 * x0
+                            + 3 * u**2 * t * x1
+                            + 3 * u * t**2 * x2
+                            + t**3 * x3,
+                            u**3 * y0
+                            + 3 * u**2 * t * y1
+                            + 3 * u * t**2 * y2
+                            + t**3 * y3,
+                        )
+                    )
+                current = (x3, y3)
+            elif name == "close":
+                polylines[-1].append(polylines[-1][0])
+        line_width = max(1, round(self.scale))
+        for points in polylines:
+            if fill and len(points) > 2:
+                self._draw.polygon(points, fill=0)
+            if stroke and len(points) > 1:
+                self._draw.line(points, fill=0, width=line_width)
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        font = preview_font(
+            round(self._fontsize * self.scale), font_file(self._fontname)
+        )
+        self._draw.text(self._pixel(x, y), text, fill=0, font=font, anchor="ls")
+
+    def showPage(self) -> None:
+        buffer = io.BytesIO()
+        self._image.save(buffer, format="PNG", optimize=False)
+        self.pages.append(buffer.getvalue())
+        self._new_image()
+        self._matrix = IDENTITY
+        self._stack = []
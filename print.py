@@ -1,22 +1,33 @@
 #!/usr/bin/env python3
 
+import argparse
+import io
+import json
+import os
 import random
+import sys
 import math
+from functools import lru_cache, partial
 from reportlab.pdfgen import canvas
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
-from typing import Tuple, Union
-from shapes import ShapeFactory
+from typing import Callable, List, Tuple, Union
+from shapes import (
+    TEXT_FONT,
+    TEXT_FONT_SIZE,
+    ShapeFactory,
+    ShapeScheduler,
+    layout_cache_bytes,
+)
+from fonts import FontMetrics, font_metrics, register_font
+from native_canvas import NativeCanvas
+from display_list import DisplayList
+from memory import MemoryProfiler
 from utils import SingleProblemCanvasProperties, SingleProblemMathProperties
-import yaml
-from functools import lru_cache
-
-
-@lru_cache(maxsize=1)
-def load_config() -> dict:
-    with open("conf.yml", "r") as f:
-        return yaml.safe_load(f)
+from difficulty import difficulty_keys, regrouping_counts
+import numpy as np
+from config import config_cache, derived, load_config, use_config
 
 
 def evaluate_problem_answer(a: int, b: int, operator: str) -> int:
@@ -27,89 +38,523 @@ def evaluate_problem_answer(a: int, b: int, operator: str) -> int:
     elif operator == "*":
         return a * b
     elif operator == "/":
-        return a / b
+        # whole number division, the remainder (if any) is left for the kid to find
+        return a // b
+
+
+PROBLEMS_PER_PAGE = 16
+
+# laid out pages of seeded packs kept for the print and preview paths to share, a pack that is
+# previewed and then printed is only laid out once
+PAGE_CACHE_SIZE = 64
+
+# packs store the arguments they were generated with in the PDF keywords, so that more pages
+# can be appended to them later (see pack_append.py)
+PACK_KEYWORDS_PREFIX = "math-practice-pack:"
+
+# canvas implementations that can render a worksheet, see native_canvas.py
+BACKENDS = {
+    "reportlab": canvas.Canvas,
+    "native": NativeCanvas,
+}
+
+
+def generate_addition_pdf(
+    filename: str = "kindergarten_addition.pdf",
+    pages: int = 1,
+    backend: str = "reportlab",
+    seed: Union[int, None] = None,
+) -> None:
+    # the seed is stored in the pack, pages can only be appended to seeded packs
+    if seed is None:
+        seed = random.getrandbits(64)
+    data = render_addition_pdf(pages, backend, seed)
+    with open(f"output/{filename}", "wb") as f:
+        f.write(data)
+
+
+def render_addition_pdf(
+    pages: int = 1,
+    backend: str = "reportlab",
+    seed: Union[int, None] = None,
+    memory_profiler: Union[MemoryProfiler, None] = None,
+    shape_scheduler: Union[ShapeScheduler, None] = None,
+    config_path: Union[str, None] = None,
+) -> bytes:
+    """
+    Renders a pack with the config at config_path, the process's config (see use_config) when
+    None.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Invalid backend: {backend}. Must be one of {list(BACKENDS.keys())}"
+        )
+    buffer = io.BytesIO()
+    c = BACKENDS[backend](buffer, pagesize=A4)
+    c.setKeywords(pack_keywords(seed, [pages], backend, config_path))
+    # content stream bytes of the pages shown so far, which the canvas keeps until it is saved
+    document = {"bytes": 0}
+    if memory_profiler is not None:
+        memory_profiler.track("layout_cache", layout_cache_bytes)
+        memory_profiler.track("document", lambda: document["bytes"])
+    for page_number in range(pages):
+        rng = random if seed is None else page_rng(seed, page_number)
+        if memory_profiler is None:
+            if seed is None or shape_scheduler is not None:
+                generate_page(
+                    c, rng, shape_scheduler=shape_scheduler, config_path=config_path
+                )
+            else:
+                seeded_page(seed, page_number, config_path).replay(c)
+                c.showPage()
+        else:
+            with memory_profiler.page(page_number):
+                # profiled pages are laid out rather than taken from the page cache, laying out
+                # is what the profiler is there to see
+                page = layout_page(
+                    rng, shape_scheduler=shape_scheduler, config_path=config_path
+                )
+                page.replay(c)
+                c.showPage()
+                document["bytes"] += page_content_bytes(page)
+    c.save()
+    return buffer.getvalue()
+
+
+class _ContentSizer(NativeCanvas):
+    # only measures content streams, which don't depend on how a font is embedded, so any font
+    # goes (NativeCanvas itself only writes the standard fonts)
+    def _font_ref(self, fontname: str) -> str:
+        return "/F1"
+
+
+def page_content_bytes(page: DisplayList) -> int:
+    """
+    Size of the content stream page turns into, which is what a canvas keeps of it until the
+    document is saved. Both backends write the same operators (see test_native_canvas.py), so
+    the native canvas' stream stands in for reportlab's.
+    """
+    sizer = _ContentSizer(io.BytesIO(), pagesize=A4, pageCompression=False)
+    page.replay(sizer)
+    sizer.showPage()
+    return sizer.content_bytes()
+
+
+def pack_config(config: dict) -> dict:
+    """
+    config the way it reads back from a pack's metadata: JSON turns keys into strings and values
+    that aren't JSON types (e.g. YAML dates) are stored as their str.
+    """
+    return json.loads(json.dumps(config, default=str))
 
 
-def generate_addition_pdf(filename: str = "kindergarten_addition.pdf") -> None:
-    c = canvas.Canvas(f"output/{filename}", pagesize=A4)
+def pack_keywords(
+    seed: Union[int, None],
+    segments: List[int],
+    backend: str,
+    config_path: Union[str, None] = None,
+) -> str:
+    """
+    The generation metadata stored in a pack. segments are the page counts the pack was rendered
+    in: the original pack first, then every batch of pages appended to it. The config is stored
+    along with its directory, which is all it takes to render more pages like the existing ones.
+    """
+    metadata = {
+        "seed": seed,
+        "segments": segments,
+        "backend": backend,
+        "config": pack_config(load_config(config_path)),
+        # relative font paths in the config are relative to this directory
+        "config_dir": os.path.dirname(config_cache(config_path).path),
+    }
+    return PACK_KEYWORDS_PREFIX + json.dumps(metadata, sort_keys=True)
+
+
+def page_rng(seed: int, page_number: int) -> random.Random:
+    # every page gets its own generator, so a single page of a seeded pack can be reproduced
+    # (e.g. for a preview) without generating the pages before it
+    return random.Random(f"{seed}:{page_number}")
+
+
+def generate_page(
+    c: Canvas,
+    rng: random.Random = random,
+    math_problems: Union[List[SingleProblemMathProperties], None] = None,
+    shape_scheduler: Union[ShapeScheduler, None] = None,
+    config_path: Union[str, None] = None,
+) -> None:
+    layout_page(rng, math_problems, shape_scheduler, config_path).replay(c)
+    c.showPage()
+
+
+def layout_page(
+    rng: random.Random = random,
+    math_problems: Union[List[SingleProblemMathProperties], None] = None,
+    shape_scheduler: Union[ShapeScheduler, None] = None,
+    config_path: Union[str, None] = None,
+) -> DisplayList:
+    """
+    Lays out a page of problems once. The returned display list can be replayed onto the PDF
+    canvas as well as the SVG and PNG preview canvases without laying the page out again.
+    math_problems are generated from the config when not given, and so is shape_scheduler (e.g. a
+    scheduler with a student's favorite shapes). The config is the one at config_path, the
+    process's config when None.
+    """
     _, height = A4
+    page = DisplayList()
 
+    title_font, text_font = derived(
+        "fonts", partial(build_fonts, config_path=config_path), config_path
+    )
     title_text = "Amyra's Math Practice"
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(2 * cm, height - 2 * cm, title_text)
-    c.setFont("Helvetica", 12)
+    page.setFont(title_font.name, title_font.size)
+    page.drawString(2 * cm, height - 2 * cm, title_text)
+    page.setFont(text_font.name, text_font.size)
     starting_height = height - 5 * cm
 
-    generate_problems(starting_height, c)
-    c.showPage()
-    c.save()
+    generate_problems(
+        starting_height,
+        page,
+        rng,
+        math_problems,
+        shape_scheduler,
+        text_font,
+        config_path,
+    )
+    return page
+
 
+def seeded_page(
+    seed: int, page_number: int, config_path: Union[str, None] = None
+) -> DisplayList:
+    """
+    The layout of a page of a seeded pack, laid out once per config version and kept in a cache of
+    the last PAGE_CACHE_SIZE pages. The display list is shared, replay it instead of changing it.
+    """
+    cache = config_cache(config_path)
+    # reading the config first makes sure the version is the one the page is laid out with
+    cache.get()
+    return _seeded_page(cache.path, cache.version, seed, page_number)
 
-def generate_numbers() -> Tuple[int, int]:
-    config = load_config()
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def _seeded_page(
+    config_path: str, version: int, seed: int, page_number: int
+) -> DisplayList:
+    return layout_page(page_rng(seed, page_number), config_path=config_path)
+
+
+def clear_page_cache() -> None:
+    _seeded_page.cache_clear()
+
+
+def generate_numbers(
+    rng: random.Random = random, config_path: Union[str, None] = None
+) -> Tuple[int, int]:
+    config = load_config(config_path)
+    if config["MATH_OPERATOR"] == "/":
+        return generate_division_numbers(rng, config_path=config_path)
     while True:
         try:
-            a = random.randint(config["MIN_NUMBER"], config["MAX_NUMBER"])
-            b = random.randint(config["MIN_NUMBER"], config["MAX_NUMBER"])
+            a = rng.randint(config["MIN_NUMBER"], config["MAX_NUMBER"])
+            b = rng.randint(config["MIN_NUMBER"], config["MAX_NUMBER"])
         except ValueError:
             raise ValueError(
                 "Configura MIN_NUMBER and MAX_NUMBER to be valid range. MIN_NUMBER should be less than MAX_NUMBER"
             )
-        if validate_generated_numbers(a, b):
+        if validate_generated_numbers(a, b, config_path):
             return a, b
 
 
-def validate_generated_numbers(a: int, b: int) -> Tuple[int, int]:
-    config = load_config()
-    if a < config["MIN_NUMBER"] or b < config["MIN_NUMBER"]:
-        return False
-    if a > config["MAX_NUMBER"] or b > config["MAX_NUMBER"]:
-        return False
-    if (
-        evaluate_problem_answer(a, b, config["MATH_OPERATOR"])
-        > config["MAX_PROBLEM_ANSWER"]
-    ):
-        return False
-    if (
-        evaluate_problem_answer(a, b, config["MATH_OPERATOR"])
-        < config["MIN_PROBLEM_ANSWER"]
-    ):
-        return False
-        print("hi")
-    return True
+def generate_division_numbers(
+    rng: random.Random = random,
+    remainder: Union[bool, None] = None,
+    config_path: Union[str, None] = None,
+) -> Tuple[int, int]:
+    """
+    Division problems are built from quotient * divisor (+ remainder) instead of drawing random
+    pairs and rejecting them, since random pairs almost never divide evenly. With remainder=False
+    every problem divides evenly, with remainder=True none of them do. Defaults to the
+    DIVISION_REMAINDER config value.
+    """
+    config = load_config(config_path)
+    if remainder is None:
+        remainder = config.get("DIVISION_REMAINDER", False)
+    table = derived(
+        f"division_table:{remainder}",
+        lambda config: division_table(
+            config["MIN_NUMBER"],
+            config["MAX_NUMBER"],
+            config["MIN_PROBLEM_ANSWER"],
+            config["MAX_PROBLEM_ANSWER"],
+            remainder,
+        ),
+        config_path,
+    )
+    q, b = sample_division(table, rng)
+    a = q * b
+    if remainder:
+        a += rng.randint(
+            max(1, config["MIN_NUMBER"] - a), min(b - 1, config["MAX_NUMBER"] - a)
+        )
+    return a, b
+
 
+def division_table(
+    min_number: int,
+    max_number: int,
+    min_answer: int,
+    max_answer: int,
+    remainder: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns every divisor that has at least one valid quotient as rows of (divisor, min quotient,
+    max quotient), along with the cumulative number of (divisor, quotient) pairs. Sampling a
+    divisor by those weights and then a quotient uniformly picks uniformly among all the valid
+    (divisor, quotient) pairs.
+    """
+    b = np.arange(
+        max(min_number, 2 if remainder else 1), max_number + 1, dtype=np.int64
+    )
+    if remainder:
+        # a = q * b + r with 1 <= r < b has to fit in [min_number, max_number]
+        q_low = np.maximum(min_answer, -((b - 1 - min_number) // b))
+        q_high = np.minimum(max_answer, (max_number - 1) // b)
+    else:
+        q_low = np.maximum(min_answer, -(-min_number // b))
+        q_high = np.minimum(max_answer, max_number // b)
+    keep = q_low <= q_high
+    divisors = np.stack([b[keep], q_low[keep], q_high[keep]], axis=1)
+    return divisors, np.cumsum(q_high[keep] - q_low[keep] + 1)
 
-def generate_problems(starting_y_position: float, canvas: Canvas) -> None:
-    config = load_config()
-    problems_per_column = 8
-    math_problems = [
+
+def sample_division(
+    table: Tuple[np.ndarray, np.ndarray],
+    rng: random.Random = random,
+) -> Tuple[int, int]:
+    # returns (quotient, divisor)
+    divisors, cumulative_weights = table
+    if len(divisors) == 0:
+        raise ValueError(
+            "No division problem fits the configured MIN_NUMBER, MAX_NUMBER, MIN_PROBLEM_ANSWER and MAX_PROBLEM_ANSWER"
+        )
+    # the k-th (divisor, quotient) pair lives in the first row whose cumulative count exceeds k
+    k = np.int64(rng.randrange(int(cumulative_weights[-1])))
+    index = int(np.searchsorted(cumulative_weights, k, side="right"))
+    b, q_low, q_high = divisors[index].tolist()
+    return rng.randint(q_low, q_high), b
+
+
+# batches generate_problem_bank draws before giving up on a carry filter nothing satisfies
+MAX_BANK_BATCHES = 1000
+# candidate pairs per batch at the least, drawing them a few at a time wastes the vectorization
+MIN_BANK_BATCH = 1024
+
+
+def generate_problem_bank(
+    size: int,
+    rng: random.Random = random,
+    min_carries: Union[int, None] = None,
+    max_carries: Union[int, None] = None,
+    config_path: Union[str, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized counterpart of generate_numbers for + and -: draws candidate pairs in batches, keeps
+    the ones validate_generated_numbers would accept and whose number of carries (borrows for -) is
+    within [min_carries, max_carries], and returns (a, b) arrays sorted easiest first.
+    """
+    config = load_config(config_path)
+    operator = config["MATH_OPERATOR"]
+    if operator not in ("+", "-"):
+        raise ValueError(
+            f"Problem banks filtered by carries only support + and -, not {operator}"
+        )
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    a_banks, b_banks = [], []
+    found = 0
+    batch = max(size, MIN_BANK_BATCH)
+    for _ in range(MAX_BANK_BATCHES):
+        if found >= size:
+            break
+        a = np_rng.integers(config["MIN_NUMBER"], config["MAX_NUMBER"] + 1, batch)
+        b = np_rng.integers(config["MIN_NUMBER"], config["MAX_NUMBER"] + 1, batch)
+        answers = evaluate_problem_answer(a, b, operator)
+        keep = (answers >= config["MIN_PROBLEM_ANSWER"]) & (
+            answers <= config["MAX_PROBLEM_ANSWER"]
+        )
+        if min_carries is not None or max_carries is not None:
+            carries = regrouping_counts(a, b, operator)
+            if min_carries is not None:
+                keep &= carries >= min_carries
+            if max_carries is not None:
+                keep &= carries <= max_carries
+        a_banks.append(a[keep])
+        b_banks.append(b[keep])
+        found += int(keep.sum())
+    else:
+        if found < size:
+            raise ValueError(
+                f"Found {found} of {size} problems in {MAX_BANK_BATCHES} batches of {batch}, MIN_CARRIES/MAX_CARRIES leave (almost) no problem in the configured ranges"
+            )
+    a = np.concatenate(a_banks)[:size]
+    b = np.concatenate(b_banks)[:size]
+    order = np.argsort(difficulty_keys(a, b, operator), kind="stable")
+    return a[order], b[order]
+
+
+def validate_generated_numbers(
+    a: int, b: int, config_path: Union[str, None] = None
+) -> bool:
+    return derived("validator", build_validator, config_path)(a, b)
+
+
+def build_validator(config: dict) -> Callable[[int, int], bool]:
+    # the config values are bound once per config version instead of looked up for every pair
+    min_number, max_number = config["MIN_NUMBER"], config["MAX_NUMBER"]
+    min_answer, max_answer = config["MIN_PROBLEM_ANSWER"], config["MAX_PROBLEM_ANSWER"]
+    operator = config["MATH_OPERATOR"]
+
+    def validate(a: int, b: int) -> bool:
+        if a < min_number or b < min_number:
+            return False
+        if a > max_number or b > max_number:
+            return False
+        answer = evaluate_problem_answer(a, b, operator)
+        if answer > max_answer or answer < min_answer:
+            return False
+        return True
+
+    return validate
+
+
+def generate_math_problems(
+    count: int, rng: random.Random = random, config_path: Union[str, None] = None
+) -> List[SingleProblemMathProperties]:
+    config = load_config(config_path)
+    if "MIN_CARRIES" in config or "MAX_CARRIES" in config:
+        # carry targeted pages come out of a filtered bank, easiest problem first
+        a_numbers, b_numbers = generate_problem_bank(
+            count,
+            rng,
+            config.get("MIN_CARRIES"),
+            config.get("MAX_CARRIES"),
+            config_path,
+        )
+        number_pairs = iter(zip(a_numbers.tolist(), b_numbers.tolist()))
+        number_factory = lambda: next(number_pairs)
+    else:
+        number_factory = lambda: generate_numbers(rng, config_path)
+    return [
         SingleProblemMathProperties(
-            number_factory=generate_numbers, operator=config["MATH_OPERATOR"]
+            number_factory=number_factory,
+            operator=config["MATH_OPERATOR"],
         )
-        for _ in range(problems_per_column * 2)
+        for _ in range(count)
     ]
-    # sort the problems by difficulty. WIP
-    math_problems_iter = iter(math_problems)
-    # First column
-    x_position = 2 * cm
-    y_position = starting_y_position
-    for i in range(1, problems_per_column + 1):
-        canvas_properties = SingleProblemCanvasProperties(
-            x_position, y_position, canvas
-        )
-        ShapeFactory.create_shape(next(math_problems_iter), canvas_properties)
-        y_position -= 3 * cm  # move down by 3cm
 
-    # Second column
-    x_position = 12 * cm
-    y_position = starting_y_position
-    for i in range(1, problems_per_column + 1):
+
+def build_fonts(
+    config: dict, config_path: Union[str, None] = None
+) -> Tuple[FontMetrics, FontMetrics]:
+    # registering a TrueType font is slow, so it happens once per process and config. Font files
+    # are relative to the config file, not to wherever the process was started
+    config_dir = os.path.dirname(config_cache(config_path).path)
+    title_font = register_font(config.get("TITLE_FONT", "Helvetica-Bold"), config_dir)
+    text_font = register_font(config.get("TEXT_FONT", TEXT_FONT), config_dir)
+    return (
+        font_metrics(title_font, config.get("TITLE_FONT_SIZE", 16)),
+        font_metrics(text_font, config.get("TEXT_FONT_SIZE", TEXT_FONT_SIZE)),
+    )
+
+
+def build_shape_scheduler(config: dict) -> ShapeScheduler:
+    return ShapeScheduler(
+        config.get("SHAPE_POLICY", "balanced"),
+        weights=config.get("SHAPE_WEIGHTS"),
+        favorites=config.get("FAVORITE_SHAPES"),
+    )
+
+
+def generate_problems(
+    starting_y_position: float,
+    canvas: Canvas,
+    rng: random.Random = random,
+    math_problems: Union[List[SingleProblemMathProperties], None] = None,
+    shape_scheduler: Union[ShapeScheduler, None] = None,
+    text_font: Union[FontMetrics, None] = None,
+    config_path: Union[str, None] = None,
+) -> None:
+    problems_per_column = PROBLEMS_PER_PAGE // 2
+    if math_problems is None:
+        math_problems = generate_math_problems(PROBLEMS_PER_PAGE, rng, config_path)
+    if shape_scheduler is None:
+        shape_scheduler = derived("shape_scheduler", build_shape_scheduler, config_path)
+    # problems are only sorted by difficulty (easiest first) on carry targeted pages, where
+    # generate_problem_bank orders them; other pages keep the order they were drawn in
+    shapes = shape_scheduler.schedule(len(math_problems), rng)
+    # two columns (at 2cm and 12cm) of problems 3cm apart, filled top to bottom. A short page
+    # (e.g. the last page of a problem bank) just leaves the remaining positions empty
+    positions = [
+        (x_position, starting_y_position - row * 3 * cm)
+        for x_position in (2 * cm, 12 * cm)
+        for row in range(problems_per_column)
+    ]
+    for (x_position, y_position), math_problem, shape_type in zip(
+        positions, math_problems, shapes
+    ):
         canvas_properties = SingleProblemCanvasProperties(
             x_position, y_position, canvas
         )
-        ShapeFactory.create_shape(next(math_problems_iter), canvas_properties)
-        y_position -= 3 * cm  # move down by 3cm
+        ShapeFactory.create_shape(
+            math_problem, canvas_properties, rng, shape_type, text_font
+        )
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate math practice worksheets")
+    parser.add_argument("--config", help="config file to use instead of conf.yml")
+    subparsers = parser.add_subparsers(dest="command")
+    generate = subparsers.add_parser("generate", help="generate a pack (default)")
+    generate.add_argument("--filename", default="kindergarten_addition.pdf")
+    generate.add_argument("--pages", type=int, default=1)
+    generate.add_argument(
+        "--backend", choices=list(BACKENDS.keys()), default="reportlab"
+    )
+    generate.add_argument("--seed", type=int)
+    append = subparsers.add_parser(
+        "append", help="append pages with new problems to a generated pack"
+    )
+    append.add_argument("--filename", default="kindergarten_addition.pdf")
+    append.add_argument("--pages", type=int, default=1)
+    subparsers.add_parser(
+        "check-config",
+        help="report how many problems the config allows and how fast they generate",
+    )
+    args = parser.parse_args(argv)
+    if args.config:
+        use_config(args.config)
+
+    if args.command == "check-config":
+        # imported here, feasibility builds on the generation functions in this module
+        from feasibility import analyze_config, format_report
+
+        report = analyze_config(load_config())
+        print(format_report(report))
+        return 0 if report["status"] == "ok" else 1
+
+    if args.command == "append":
+        # imported here, pack_append builds on the generation functions in this module
+        from pack_append import append_pages
+
+        total = append_pages(f"output/{args.filename}", args.pages)
+        print(f"output/{args.filename} now has {total} pages")
+        return 0
+
+    if args.command is None:
+        args = generate.parse_args([])
+    generate_addition_pdf(args.filename, args.pages, args.backend, args.seed)
+    return 0
 
 
 if __name__ == "__main__":
-    generate_addition_pdf()
+    sys.exit(main())
@@ -1,9 +1,14 @@
+import itertools
 import math
 import random
-from typing import Tuple
+from typing import Dict, List, Tuple, Union
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.units import cm
+from display_list import DisplayList
+from fonts import FontMetrics, font_metrics
+from memory import active_profiler
 from utils import SingleProblemMathProperties, SingleProblemCanvasProperties
 
 TEXT_FONT = "Helvetica"
@@ -19,9 +24,12 @@ class MathProblemShape(ABC):
         self,
         math_problem: SingleProblemMathProperties,
         canvas_properties: SingleProblemCanvasProperties,
+        font: Union[FontMetrics, None] = None,
     ):
         self.math_problem_properties = math_problem
         self.canvas_properties = canvas_properties
+        # the font the canvas draws the text in, used to center the numbers
+        self.font = font or font_metrics(TEXT_FONT, TEXT_FONT_SIZE)
 
     @abstractmethod
     def setup_canvas(self) -> None:
@@ -66,8 +74,8 @@ class Flower(MathProblemShape):
     def setup_canvas(self) -> None:
         problem = f"{self.math_problem_properties}"
         self.canvas = self.canvas_properties.canvas
-        self.text_width = self.canvas.stringWidth(problem, TEXT_FONT, TEXT_FONT_SIZE)
-        self.text_height = TEXT_FONT_SIZE
+        self.text_width = self.font.string_width(problem)
+        self.text_height = self.font.size
         self.x_position = self.canvas_properties.x_position
         self.y_position = self.canvas_properties.y_position
 
@@ -117,16 +125,10 @@ class Flower(MathProblemShape):
         # Eye center positions for numbers
         # Position numbers inside the eyes
         left_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.a), TEXT_FONT, TEXT_FONT_SIZE
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.a)) / 2
         )
         right_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.b), TEXT_FONT, TEXT_FONT_SIZE
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.b)) / 2
         )
         text_offset_y = self.text_height / 3
         left_eye_x = self.center_x - eye_spacing / 2
@@ -144,10 +146,7 @@ class Flower(MathProblemShape):
 
     def draw_operator(self) -> None:
         plus_offset_x = (
-            self.canvas.stringWidth(
-                self.math_problem_properties.operator, TEXT_FONT, TEXT_FONT_SIZE
-            )
-            / 2
+            self.font.string_width(self.math_problem_properties.operator) / 2
         )
         x_location = self.center_x - plus_offset_x
         y_location = self.center_y - self.text_offset_y
@@ -168,8 +167,8 @@ class CircleHumanSimple(MathProblemShape):
         problem_text = f"{self.math_problem_properties}"
         self.canvas = self.canvas_properties.canvas
         # Calculate text width and height for the oval
-        self.text_width = self.canvas.stringWidth(problem_text, "Helvetica", 12)
-        self.text_height = 12  # Font size
+        self.text_width = self.font.string_width(problem_text)
+        self.text_height = self.font.size
 
     def draw_outline(self) -> None:
         # Draw the circular face
@@ -201,16 +200,10 @@ class CircleHumanSimple(MathProblemShape):
         # Position numbers inside the eye circles
         # Calculate offset based on actual number width
         left_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.a), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.a)) / 2
         )
         right_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.b), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.b)) / 2
         )
         self.text_offset_y = (
             self.text_height / 3
@@ -230,10 +223,7 @@ class CircleHumanSimple(MathProblemShape):
     def draw_operator(self) -> None:
         # Add plus sign as nose
         plus_offset_x = (
-            self.canvas.stringWidth(
-                self.math_problem_properties.operator, "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(self.math_problem_properties.operator) / 2
         )
         self.canvas.drawString(
             self.center_x - plus_offset_x,
@@ -251,8 +241,8 @@ class Robot(MathProblemShape):
         )  # move up a bit to make room for the robot head
 
         # Calculate text width and height for positioning
-        self.text_width = self.canvas.stringWidth(problem, "Helvetica", 12)
-        self.text_height = 12  # Font size
+        self.text_width = self.font.string_width(problem)
+        self.text_height = self.font.size
 
     def draw_outline(self) -> None:
         # Calculate center positions for the robot
@@ -299,16 +289,10 @@ class Robot(MathProblemShape):
     def draw_numbers(self, eye_spacing: float) -> None:
         # Position numbers inside the digital eyes
         left_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.a), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.a)) / 2
         )
         right_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.b), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.b)) / 2
         )
         text_offset_y = self.text_height / 3
 
@@ -332,10 +316,7 @@ class Robot(MathProblemShape):
         # Add plus sign between eyes
         text_offset_y = self.text_height / 3
         plus_offset_x = (
-            self.canvas.stringWidth(
-                self.math_problem_properties.operator, "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(self.math_problem_properties.operator) / 2
         )
         self.canvas.drawString(
             self.robot_center_x - plus_offset_x,
@@ -350,8 +331,8 @@ class Balloon(MathProblemShape):
         self.canvas = self.canvas_properties.canvas
 
         # Calculate text width and height for positioning
-        self.text_width = self.canvas.stringWidth(problem, "Helvetica", 12)
-        self.text_height = 12  # Font size
+        self.text_width = self.font.string_width(problem)
+        self.text_height = self.font.size
 
         # Calculate center positions for the balloon
         self.balloon_center_x = self.canvas_properties.x_position + self.text_width / 2
@@ -399,16 +380,10 @@ class Balloon(MathProblemShape):
 
     def draw_numbers(self, eye_spacing: float) -> None:
         left_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.a), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.a)) / 2
         )
         right_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.b), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.b)) / 2
         )
         # Position numbers inside the eyes
         self.text_offset_y = self.text_height / 3
@@ -431,10 +406,7 @@ class Balloon(MathProblemShape):
     def draw_operator(self) -> None:
         # Add plus sign between eyes
         plus_offset_x = (
-            self.canvas.stringWidth(
-                self.math_problem_properties.operator, "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(self.math_problem_properties.operator) / 2
         )
         self.canvas.drawString(
             self.balloon_center_x - plus_offset_x,
@@ -448,8 +420,8 @@ class Cat(MathProblemShape):
         problem = f"{self.math_problem_properties}"
         self.canvas = self.canvas_properties.canvas
         # Calculate text width and height for positioning
-        self.text_width = self.canvas.stringWidth(problem, "Helvetica", 12)
-        self.text_height = 12  # Font size
+        self.text_width = self.font.string_width(problem)
+        self.text_height = self.font.size
 
         # Calculate center positions for the cat
         self.cat_center_x = self.canvas_properties.x_position + self.text_width / 2
@@ -504,16 +476,10 @@ class Cat(MathProblemShape):
     def draw_numbers(self, eye_spacing: float) -> None:
         # Position numbers inside the eyes
         left_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.a), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.a)) / 2
         )
         right_text_offset_x = (
-            self.canvas.stringWidth(
-                str(self.math_problem_properties.b), "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(str(self.math_problem_properties.b)) / 2
         )
         self.text_offset_y = self.text_height / 3
 
@@ -536,10 +502,7 @@ class Cat(MathProblemShape):
     def draw_operator(self) -> None:
         # Add plus sign in the nose area
         plus_offset_x = (
-            self.canvas.stringWidth(
-                self.math_problem_properties.operator, "Helvetica", 12
-            )
-            / 2
+            self.font.string_width(self.math_problem_properties.operator) / 2
         )
         self.canvas.drawString(
             self.cat_center_x - plus_offset_x,
@@ -562,10 +525,203 @@ class ShapeFactory:
         cls,
         math_problem: MathProblemShape,
         canvas_properties: SingleProblemCanvasProperties,
+        rng: random.Random = random,
+        shape_type: Union[str, None] = None,
+        font: Union[FontMetrics, None] = None,
     ) -> float:
-        shape_type = random.choice(list(cls.SHAPES.keys()))
-        shape_class = cls.SHAPES[shape_type]
-        return shape_class(math_problem, canvas_properties).draw()
+        """
+        Draws math_problem as shape_type, or as a random shape when no shape is given. Pages get
+        their shapes from a ShapeScheduler so the choice is made once per page. font is the font
+        the canvas is set to, Helvetica 12 when not given.
+        """
+        if shape_type is None:
+            shape_type = rng.choice(SHAPE_NAMES)
+        profiler = active_profiler()
+        if profiler is None:
+            cls.draw_shape(shape_type, math_problem, canvas_properties, font)
+        else:
+            with profiler.shape(cls.SHAPES[shape_type].__name__):
+                cls.draw_shape(shape_type, math_problem, canvas_properties, font)
+        return canvas_properties.y_position - 3 * cm
+
+    @classmethod
+    def draw_shape(
+        cls,
+        shape_type: str,
+        math_problem: MathProblemShape,
+        canvas_properties: SingleProblemCanvasProperties,
+        font: Union[FontMetrics, None] = None,
+    ) -> None:
+        font = font or font_metrics(TEXT_FONT, TEXT_FONT_SIZE)
+        layout = layout_shape(
+            shape_type,
+            math_problem.a,
+            math_problem.b,
+            math_problem.operator,
+            font.name,
+            font.size,
+        )
+        layout.replay(
+            canvas_properties.canvas,
+            canvas_properties.x_position,
+            canvas_properties.y_position,
+        )
+
+
+SHAPE_NAMES = tuple(ShapeFactory.SHAPES.keys())
+
+
+class ShapeScheduler:
+    """
+    Assigns shapes to a whole page (or pack) in one pass, so the renderer gets a ready-made
+    sequence instead of picking a shape per problem. Policies:
+    * random: independent uniform choice per problem, which is what pages used to do
+    * balanced: every shape appears equally often (up to one) with no shape twice in a row
+    * no_repeat: random choice that never repeats the previous shape
+    * weighted: random choice by weights, a dict of shape name to weight
+    * favorites: the favorites (e.g. a student's favorite shapes) fill favorite_share of the
+      problems, the other shapes share the rest
+    """
+
+    POLICIES = ["random", "balanced", "no_repeat", "weighted", "favorites"]
+
+    def __init__(
+        self,
+        policy: str = "balanced",
+        weights: Union[Dict[str, float], None] = None,
+        favorites: Union[List[str], None] = None,
+        favorite_share: float = 0.5,
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f"Invalid policy: {policy}. Must be one of {self.POLICIES}"
+            )
+        self.policy = policy
+        if policy == "favorites":
+            # a favorite listed twice is still one favorite, it doesn't get a double share
+            favorites = list(dict.fromkeys(favorites or []))
+            unknown = [shape for shape in favorites if shape not in SHAPE_NAMES]
+            if not favorites or unknown:
+                raise ValueError(
+                    f"favorites must be a non empty list of shapes from {list(SHAPE_NAMES)}"
+                )
+            if not 0 <= favorite_share <= 1:
+                raise ValueError(
+                    f"favorite_share must be between 0 and 1, got {favorite_share}"
+                )
+            others = [shape for shape in SHAPE_NAMES if shape not in favorites]
+            if not others:
+                favorite_share = 1
+            weights = {shape: favorite_share / len(favorites) for shape in favorites}
+            weights.update(
+                {shape: (1 - favorite_share) / len(others) for shape in others}
+            )
+        if policy in ("weighted", "favorites"):
+            weights = weights or {}
+            unknown = [shape for shape in weights if shape not in SHAPE_NAMES]
+            if unknown:
+                raise ValueError(
+                    f"Unknown shapes {unknown}. Must be one of {list(SHAPE_NAMES)}"
+                )
+            negative = {
+                shape: weight for shape, weight in weights.items() if weight < 0
+            }
+            if negative:
+                raise ValueError(f"Shape weights can't be negative, got {negative}")
+            self.cumulative_weights = list(
+                itertools.accumulate(weights.get(shape, 0) for shape in SHAPE_NAMES)
+            )
+            if self.cumulative_weights[-1] <= 0:
+                raise ValueError("At least one shape needs a positive weight")
+
+    def schedule(self, count: int, rng: random.Random = random) -> List[str]:
+        if self.policy == "random":
+            return rng.choices(SHAPE_NAMES, k=count)
+        if self.policy in ("weighted", "favorites"):
+            return rng.choices(
+                SHAPE_NAMES, cum_weights=self.cumulative_weights, k=count
+            )
+        if self.policy == "no_repeat":
+            shapes = []
+            for _ in range(count):
+                previous = shapes[-1] if shapes else None
+                shapes.append(
+                    rng.choice([shape for shape in SHAPE_NAMES if shape != previous])
+                )
+            return shapes
+        return self._balanced(count, rng)
+
+    def _balanced(self, count: int, rng: random.Random) -> List[str]:
+        # equal counts for every shape, the extra count%n shapes picked at random
+        remaining = dict.fromkeys(SHAPE_NAMES, count // len(SHAPE_NAMES))
+        for shape in rng.sample(SHAPE_NAMES, count % len(SHAPE_NAMES)):
+            remaining[shape] += 1
+        shapes = []
+        for left in range(count, 0, -1):
+            previous = shapes[-1] if shapes else None
+            # only pick a shape if the rest can still be ordered without repeats: no other
+            # shape may need more than every other slot, and the picked one can't go first
+            candidates = [
+                shape
+                for shape in SHAPE_NAMES
+                if shape != previous
+                and remaining[shape]
+                and remaining[shape] - 1 <= (left - 1) // 2
+                and all(
+                    remaining[other] <= left // 2
+                    for other in SHAPE_NAMES
+                    if other != shape
+                )
+            ]
+            shape = rng.choices(
+                candidates, weights=[remaining[shape] for shape in candidates]
+            )[0]
+            remaining[shape] -= 1
+            shapes.append(shape)
+        return shapes
+
+
+@lru_cache(maxsize=4096)
+def layout_shape(
+    shape_type: str,
+    a: int,
+    b: int,
+    operator: str,
+    font_name: str = TEXT_FONT,
+    font_size: float = TEXT_FONT_SIZE,
+) -> DisplayList:
+    """
+    Draws the shape for a problem once into a display list positioned at the origin. The shapes
+    only depend on their position through a translation, so the cached recording is replayed at
+    the problem's position instead of recomputing the geometry every time.
+    """
+    display_list = DisplayList()
+    math_problem = SingleProblemMathProperties(
+        number_factory=lambda: (a, b), operator=operator
+    )
+    canvas_properties = SingleProblemCanvasProperties(0, 0, display_list)
+    ShapeFactory.SHAPES[shape_type](
+        math_problem, canvas_properties, font_metrics(font_name, font_size)
+    ).draw()
+    if active_profiler() is not None:
+        _built_layouts["count"] += 1
+        _built_layouts["bytes"] += display_list.nbytes()
+    return display_list
+
+
+# size of the layouts built while a memory profiler was active
+_built_layouts = {"count": 0, "bytes": 0}
+
+
+def layout_cache_bytes() -> int:
+    """
+    Estimated memory held by the layout cache: the number of cached layouts times the average size
+    of the layouts built while a memory profiler was active.
+    """
+    if not _built_layouts["count"]:
+        return 0
+    average = _built_layouts["bytes"] / _built_layouts["count"]
+    return round(layout_shape.cache_info().currsize * average)
 
 
 """
@@ -0,0 +1,167 @@
+import io
+import random
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, List, Sequence, Union
+import numpy as np
+from reportlab.lib.pagesizes import A4
+from difficulty import difficulty_keys, digit_widths
+from print import (
+    BACKENDS,
+    PROBLEMS_PER_PAGE,
+    evaluate_problem_answer,
+    generate_page,
+    page_rng,
+)
+from utils import SingleProblemMathProperties
+
+OPERATORS = SingleProblemMathProperties.OPERATOR_ENUM
+# columns of every row in the bank, the operator is stored as its index in OPERATORS
+FIELDS = ("a", "b", "operator", "answer", "difficulty")
+# the first int64 of the segment holds the number of problems, so workers can attach by name
+HEADER_ITEMS = 1
+ITEM_SIZE = np.dtype(np.int64).itemsize
+
+
+def bank_difficulty_keys(a: np.ndarray, b: np.ndarray, operator: str) -> np.ndarray:
+    # + and - use the carry/borrow analysis, * and / the same measures as
+    # SingleProblemMathProperties.multiply_difficulty and divide_difficulty
+    if operator in ("+", "-"):
+        return difficulty_keys(a, b, operator)
+    if operator == "*":
+        return a * b
+    return digit_widths(a).astype(np.int64) + digit_widths(b)
+
+
+class SharedProblemBank:
+    """
+    A pre-generated bank of problems in a multiprocessing.shared_memory segment, stored as a
+    fixed-width int64 array with one row of FIELDS per problem. Render processes attach to it by
+    name and read page slices straight out of the shared segment, so the bank exists once in
+    memory no matter how many workers use it.
+
+    The process that created the bank owns it and unlinks the segment on close.
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_ITEMS,), dtype=np.int64, buffer=shm.buf)
+        self.size = int(header[0])
+        self.array = np.ndarray(
+            (self.size, len(FIELDS)),
+            dtype=np.int64,
+            buffer=shm.buf,
+            offset=HEADER_ITEMS * ITEM_SIZE,
+        )
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(
+        cls, math_problems: Sequence[SingleProblemMathProperties]
+    ) -> "SharedProblemBank":
+        a = np.fromiter((problem.a for problem in math_problems), dtype=np.int64)
+        b = np.fromiter((problem.b for problem in math_problems), dtype=np.int64)
+        operators = np.fromiter(
+            (OPERATORS.index(problem.operator) for problem in math_problems),
+            dtype=np.int64,
+        )
+        return cls.from_arrays(a, b, operators)
+
+    @classmethod
+    def from_arrays(
+        cls, a: np.ndarray, b: np.ndarray, operators: np.ndarray
+    ) -> "SharedProblemBank":
+        """
+        Builds a bank from parallel arrays of operands and operator indexes (see OPERATORS),
+        computing the answer and difficulty columns.
+        """
+        size = len(a)
+        shm = SharedMemory(
+            create=True, size=max((HEADER_ITEMS + size * len(FIELDS)) * ITEM_SIZE, 1)
+        )
+        np.ndarray((HEADER_ITEMS,), dtype=np.int64, buffer=shm.buf)[0] = size
+        bank = cls(shm, owner=True)
+        bank.array[:, 0] = a
+        bank.array[:, 1] = b
+        bank.array[:, 2] = operators
+        for index, operator in enumerate(OPERATORS):
+            rows = bank.array[:, 2] == index
+            if not rows.any():
+                continue
+            a_rows, b_rows = bank.array[rows, 0], bank.array[rows, 1]
+            bank.array[rows, 3] = evaluate_problem_answer(a_rows, b_rows, operator)
+            bank.array[rows, 4] = bank_difficulty_keys(a_rows, b_rows, operator)
+        return bank
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedProblemBank":
+        try:
+            shm = SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13 attaching always registers the segment with the resource
+            # tracker, which unlinks it when the process exits. A render process started on its
+            # own has its own tracker and would take the bank away from every other worker, so
+            # the segment is unregistered again (the creator re-registers it before unlinking)
+            shm = SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def page(self, page_number: int, per_page: int = PROBLEMS_PER_PAGE) -> np.ndarray:
+        # a view into the shared segment, nothing is copied
+        return self.array[page_number * per_page : (page_number + 1) * per_page]
+
+    def math_problems(
+        self, page_number: int, per_page: int = PROBLEMS_PER_PAGE
+    ) -> List[SingleProblemMathProperties]:
+        return [
+            SingleProblemMathProperties(
+                number_factory=lambda a=a, b=b: (a, b), operator=OPERATORS[operator]
+            )
+            for a, b, operator, _, _ in self.page(page_number, per_page).tolist()
+        ]
+
+    def pages(self, per_page: int = PROBLEMS_PER_PAGE) -> int:
+        return -(-self.size // per_page)
+
+    def close(self) -> None:
+        # views into the buffer have to go before the segment can be closed
+        del self.array
+        self.shm.close()
+        if self.owner:
+            # workers forked from the creator share its tracker, their unregister removed the
+            # creator's registration too and unlink unregisters it once more
+            resource_tracker.register(self.shm._name, "shared_memory")
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedProblemBank":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def render_bank_pdf(
+    name: str,
+    page_numbers: Iterable[int],
+    backend: str = "reportlab",
+    seed: Union[int, None] = None,
+) -> bytes:
+    """
+    Renders the given pages of a shared bank to a PDF. Meant to run in worker processes, which
+    only need the bank's name.
+    """
+    bank = SharedProblemBank.attach(name)
+    try:
+        buffer = io.BytesIO()
+        c = BACKENDS[backend](buffer, pagesize=A4)
+        for page_number in page_numbers:
+            rng = random if seed is None else page_rng(seed, page_number)
+            generate_page(c, rng, bank.math_problems(page_number))
+        c.save()
+        return buffer.getvalue()
+    finally:
+        bank.close()
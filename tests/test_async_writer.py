@@ -0,0 +1,63 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+from pypdf import PdfReader
+import async_writer
+from async_writer import write_packs
+from config import DEFAULT_CONFIG_PATH, load_config, use_config
+from pack_append import read_pack_metadata
+import pytest
+
+
+def test_write_packs_writes_every_pack(tmp_path):
+    jobs = [{"filename": f"pack{i}.pdf", "pages": 1, "seed": i} for i in range(3)]
+    paths = asyncio.run(
+        write_packs(jobs, str(tmp_path), max_renders=2, max_queued=1, fsync=False)
+    )
+    assert paths == [str(tmp_path / f"pack{i}.pdf") for i in range(3)]
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(5) == b"%PDF-"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_write_packs_raises_write_errors(tmp_path):
+    jobs = [{"filename": "pack.pdf", "pages": 1}]
+    with pytest.raises(OSError):
+        asyncio.run(write_packs(jobs, str(tmp_path / "missing")))
+
+
+def test_write_packs_raises_other_write_errors_instead_of_hanging(
+    tmp_path, monkeypatch
+):
+    def failing_write_file(path, data, fsync=True):
+        raise RuntimeError("storage driver bug")
+
+    monkeypatch.setattr(async_writer, "write_file", failing_write_file)
+    jobs = [{"filename": f"pack{i}.pdf", "pages": 1, "seed": i} for i in range(4)]
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            asyncio.wait_for(
+                write_packs(jobs, str(tmp_path), max_queued=1, writers=1), timeout=30
+            )
+        )
+
+
+def test_write_packs_renders_with_the_current_config_in_spawned_workers(tmp_path):
+    config_path = tmp_path / "conf.yml"
+    config_path.write_text(
+        yaml.safe_dump({**load_config(DEFAULT_CONFIG_PATH), "MIN_NUMBER": 100})
+    )
+    jobs = [{"filename": "pack.pdf", "pages": 1, "seed": 1}]
+    spawn = multiprocessing.get_context("spawn")
+    use_config(str(config_path))
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+            (path,) = asyncio.run(
+                write_packs(jobs, str(tmp_path), executor=executor, fsync=False)
+            )
+    finally:
+        use_config(DEFAULT_CONFIG_PATH)
+    assert read_pack_metadata(PdfReader(path))["config"]["MIN_NUMBER"] == 100
@@ -0,0 +1,37 @@
+import os
+from config import ConfigCache
+
+
+def write_config(path, max_number: int, mtime: int) -> None:
+    path.write_text(f"MIN_NUMBER: 1\nMAX_NUMBER: {max_number}\n")
+    os.utime(path, (mtime, mtime))
+
+
+def test_config_cache_rebuilds_derived_only_when_config_changes(tmp_path):
+    path = tmp_path / "conf.yml"
+    write_config(path, 10, mtime=1000)
+    cache = ConfigCache(str(path), check_interval=0)
+    builds = []
+    build = lambda config: builds.append(config["MAX_NUMBER"]) or len(builds)
+
+    assert cache.get()["MAX_NUMBER"] == 10
+    assert cache.derived("table", build) == cache.derived("table", build) == 1
+
+    # rewritten with the same content: re-read, but derived structures are kept
+    write_config(path, 10, mtime=2000)
+    assert cache.derived("table", build) == 1
+    assert cache.version == 1
+
+    write_config(path, 20, mtime=3000)
+    assert cache.get()["MAX_NUMBER"] == 20
+    assert cache.derived("table", build) == 2
+    assert builds == [10, 20]
+
+
+def test_config_cache_skips_stat_within_check_interval(tmp_path):
+    path = tmp_path / "conf.yml"
+    write_config(path, 10, mtime=1000)
+    cache = ConfigCache(str(path), check_interval=3600)
+    cache.get()
+    write_config(path, 20, mtime=2000)
+    assert cache.get()["MAX_NUMBER"] == 10
@@ -0,0 +1,42 @@
+import numpy as np
+import yaml
+from config import DEFAULT_CONFIG_PATH, load_config, use_config
+from difficulty import borrow_counts, carry_counts, difficulty_keys, digit_widths
+from print import render_addition_pdf
+import pytest
+
+
+def test_carry_counts():
+    assert carry_counts([12, 95, 999, 0], [13, 7, 1, 0]).tolist() == [0, 2, 3, 0]
+
+
+def test_borrow_counts_orders_operands():
+    assert borrow_counts([57, 100, 7, 52], [23, 1, 52, 7]).tolist() == [0, 2, 1, 1]
+
+
+def test_digit_widths():
+    assert digit_widths([0, 9, 10, -250, 1000]).tolist() == [1, 1, 2, 3, 4]
+
+
+def test_difficulty_keys_sort_by_carries_first():
+    a = np.array([95, 11, 45])
+    b = np.array([7, 12, 5])
+    assert np.argsort(difficulty_keys(a, b, "+")).tolist() == [1, 2, 0]
+
+
+def test_regrouping_analysis_rejects_other_operators():
+    with pytest.raises(ValueError):
+        difficulty_keys([6], [3], "/")
+
+
+def test_unsatisfiable_carry_filter_raises(tmp_path):
+    # 60..120 + 60..120 never carries in 4 columns
+    path = tmp_path / "conf.yml"
+    config = {**load_config(DEFAULT_CONFIG_PATH), "MIN_CARRIES": 4}
+    path.write_text(yaml.safe_dump(config))
+    use_config(str(path))
+    try:
+        with pytest.raises(ValueError):
+            render_addition_pdf(1)
+    finally:
+        use_config(DEFAULT_CONFIG_PATH)
@@ -0,0 +1,35 @@
+from reportlab.lib.pagesizes import A4
+from display_list import DisplayList
+from preview_canvas import PNGCanvas, SVGCanvas
+from shapes import ShapeFactory, layout_shape
+from utils import SingleProblemCanvasProperties, SingleProblemMathProperties
+
+
+def test_layout_shape_is_cached_per_shape_and_problem():
+    assert layout_shape("cat", 3, 4, "+") is layout_shape("cat", 3, 4, "+")
+    assert layout_shape("cat", 3, 4, "+") is not layout_shape("robot", 3, 4, "+")
+
+
+def test_create_shape_replays_layout_at_problem_position():
+    page = DisplayList()
+    math_problem = SingleProblemMathProperties(
+        number_factory=lambda: (3, 4), operator="+"
+    )
+    y_position = ShapeFactory.create_shape(
+        math_problem, SingleProblemCanvasProperties(10, 20, page)
+    )
+    assert y_position < 20
+    assert page.ops[:2] == [("saveState", ()), ("translate", (10, 20))]
+    assert page.ops[-1] == ("restoreState", ())
+
+
+def test_display_list_replays_to_svg_and_png():
+    page = DisplayList()
+    page.setFont("Helvetica", 12)
+    layout_shape("balloon", 3, 4, "+").replay(page, 100, 100)
+    svg, png = SVGCanvas(A4), PNGCanvas(A4, scale=0.25)
+    for canvas in (svg, png):
+        page.replay(canvas)
+        canvas.showPage()
+    assert svg.pages[0].startswith("<svg") and ">3</text>" in svg.pages[0]
+    assert png.pages[0].startswith(b"\x89PNG")
@@ -0,0 +1,31 @@
+import random
+from print import division_table, evaluate_problem_answer, sample_division
+import pytest
+
+
+@pytest.mark.parametrize("remainder", [False, True])
+def test_division_table_covers_exactly_the_valid_pairs(remainder):
+    divisors, cumulative_weights = division_table(4, 120, 2, 50, remainder)
+    expected = {
+        (a // b, b)
+        for a in range(4, 121)
+        for b in range(4, 121)
+        if 2 <= a // b <= 50 and (a % b != 0) == remainder
+    }
+    table_pairs = {(q, b) for b, low, high in divisors for q in range(low, high + 1)}
+    assert table_pairs == expected
+    assert cumulative_weights[-1] == len(expected)
+
+
+def test_sample_division_returns_quotient_within_bounds():
+    table = division_table(4, 120, 2, 50, False)
+    rng = random.Random(0)
+    for _ in range(1000):
+        q, b = sample_division(table, rng)
+        assert 4 <= q * b <= 120
+        assert evaluate_problem_answer(q * b, b, "/") == q
+
+
+def test_sample_division_raises_when_nothing_fits():
+    with pytest.raises(ValueError):
+        sample_division(division_table(60, 120, 2, 50, True))
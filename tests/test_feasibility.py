@@ -0,0 +1,93 @@
+from feasibility import analyze_config, feasible_pair_count, format_report
+from print import evaluate_problem_answer
+import pytest
+
+
+@pytest.mark.parametrize("operator", ["+", "-", "*", "/"])
+def test_feasible_pair_count_matches_brute_force(operator):
+    min_number, max_number, min_answer, max_answer = -6, 12, -5, 20
+    expected = sum(
+        1
+        for a in range(min_number, max_number + 1)
+        for b in range(min_number, max_number + 1)
+        if not (operator == "/" and b <= 0)
+        and min_answer <= evaluate_problem_answer(a, b, operator) <= max_answer
+    )
+    assert (
+        feasible_pair_count(min_number, max_number, min_answer, max_answer, operator)
+        == expected
+    )
+
+
+def test_feasible_division_count_splits_by_remainder():
+    with_remainder = feasible_pair_count(1, 50, 1, 10, "/", remainder=True)
+    without_remainder = feasible_pair_count(1, 50, 1, 10, "/", remainder=False)
+    assert with_remainder + without_remainder == feasible_pair_count(1, 50, 1, 10, "/")
+
+
+def make_config(**overrides) -> dict:
+    config = {
+        "MATH_OPERATOR": "+",
+        "MIN_NUMBER": 60,
+        "MAX_NUMBER": 120,
+        "MIN_PROBLEM_ANSWER": 15,
+        "MAX_PROBLEM_ANSWER": 500,
+    }
+    config.update(overrides)
+    return config
+
+
+def test_analyze_config_reports_acceptance():
+    report = analyze_config(make_config(MAX_PROBLEM_ANSWER=180), timing_draws=100)
+    assert report["status"] == "ok"
+    assert report["acceptance_probability"] == pytest.approx(
+        report["feasible_pairs"] / 61**2
+    )
+    assert report["problems_per_second"] > 0
+
+
+def test_analyze_config_flags_infeasible_and_slow_configs():
+    assert analyze_config(make_config(MIN_PROBLEM_ANSWER=300))["status"] == "infeasible"
+    slow = make_config(
+        MATH_OPERATOR="*", MIN_NUMBER=1, MAX_NUMBER=100000, MAX_PROBLEM_ANSWER=100
+    )
+    assert analyze_config(slow, timing_draws=100)["status"] == "slow"
+
+
+def test_analyze_config_estimates_the_carry_filtered_region():
+    plain = analyze_config(make_config(), timing_draws=100)
+    report = analyze_config(make_config(MIN_CARRIES=2), timing_draws=100)
+    assert report["estimated"]
+    assert 0 < report["feasible_pairs"] < plain["feasible_pairs"]
+    assert "feasible pairs:         ~" in format_report(report)
+
+    assert report["status"] == "ok"
+    assert report["problems_per_second"] > 0
+
+    infeasible = analyze_config(make_config(MIN_CARRIES=5), timing_draws=100)
+    assert infeasible["status"] == "infeasible"
+    assert "generate_problem_bank" in infeasible["warnings"][-1]
+
+
+def test_carry_configs_are_judged_by_the_bank_batch_limit():
+    # about 5e-5 of the pairs are in range: some 300 batches per page, and some 7000 with a
+    # tighter answer range
+    rare = make_config(
+        MIN_NUMBER=0,
+        MAX_NUMBER=9999,
+        MIN_PROBLEM_ANSWER=0,
+        MAX_PROBLEM_ANSWER=100,
+        MAX_CARRIES=3,
+    )
+    report = analyze_config(rare, timing_draws=100)
+    assert report["status"] == "slow"
+    assert 100 < report["expected_batches"] < 1000
+    rarer = analyze_config({**rare, "MAX_PROBLEM_ANSWER": 20}, timing_draws=100)
+    assert rarer["status"] == "infeasible"
+    assert rarer["expected_batches"] > 1000
+
+
+def test_infeasible_division_names_sample_division():
+    report = analyze_config(make_config(MATH_OPERATOR="/", MIN_PROBLEM_ANSWER=300))
+    assert report["status"] == "infeasible"
+    assert "sample_division" in report["warnings"][-1]
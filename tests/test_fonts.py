@@ -0,0 +1,70 @@
+import os
+import shutil
+import reportlab
+import yaml
+from reportlab.pdfbase import pdfmetrics
+from config import DEFAULT_CONFIG_PATH, load_config, use_config
+from fonts import font_file, font_metrics, register_font
+from print import build_fonts, render_addition_pdf
+import pytest
+
+TTF_PATH = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+
+
+@pytest.mark.parametrize("font", ["Helvetica", TTF_PATH])
+def test_font_metrics_match_reportlab(font):
+    name = register_font(font)
+    metrics = font_metrics(name, 14)
+    for text in ["103 + 42", "7 / 2", "x = ?", "é"]:
+        assert metrics.string_width(text) == pytest.approx(
+            pdfmetrics.stringWidth(text, name, 14)
+        )
+
+
+def test_ttf_fonts_are_registered_once():
+    assert register_font(TTF_PATH) == "Vera"
+    assert register_font(TTF_PATH) == register_font("Vera") == "Vera"
+    assert font_file("Vera") == TTF_PATH
+    assert font_file("Helvetica") is None
+    with pytest.raises(ValueError):
+        register_font("Comic Sans")
+
+
+def test_pack_renders_in_configured_ttf_font(tmp_path):
+    path = tmp_path / "conf.yml"
+    config = {**load_config(DEFAULT_CONFIG_PATH), "TEXT_FONT": TTF_PATH}
+    path.write_text(yaml.safe_dump(config))
+    use_config(str(path))
+    try:
+        data = render_addition_pdf(2, seed=1)
+    finally:
+        use_config(DEFAULT_CONFIG_PATH)
+    assert b"Vera" in data
+
+
+def test_relative_ttf_paths_are_relative_to_the_config_file(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "fonts")
+    shutil.copy(TTF_PATH, tmp_path / "fonts" / "Vera.ttf")
+    path = tmp_path / "conf.yml"
+    config = {**load_config(DEFAULT_CONFIG_PATH), "TEXT_FONT": "fonts/Vera.ttf"}
+    path.write_text(yaml.safe_dump(config))
+    monkeypatch.chdir(os.path.dirname(TTF_PATH))
+    use_config(str(path))
+    try:
+        render_addition_pdf(1, seed=1)
+        text_font = build_fonts(load_config())[1]
+    finally:
+        use_config(DEFAULT_CONFIG_PATH)
+    assert font_file(text_font.name) == str(tmp_path / "fonts" / "Vera.ttf")
+
+
+def test_ttf_files_with_the_same_name_get_different_font_names(tmp_path):
+    for directory in ("first", "second"):
+        os.makedirs(tmp_path / directory)
+        shutil.copy(TTF_PATH, tmp_path / directory / "Vera.ttf")
+    first = register_font("Vera.ttf", str(tmp_path / "first"))
+    second = register_font(str(tmp_path / "second" / "Vera.ttf"))
+    assert first != second
+    assert font_file(first) == str(tmp_path / "first" / "Vera.ttf")
+    assert font_file(second) == str(tmp_path / "second" / "Vera.ttf")
+    assert register_font(str(tmp_path / "first" / "Vera.ttf")) == first
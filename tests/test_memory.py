@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from reportlab.pdfgen.canvas import Canvas
+from memory import MemoryGrowthError, MemoryProfiler
+import print as print_module
+from print import render_addition_pdf
+import pytest
+
+
+def test_memory_profiler_records_pages_and_shape_classes():
+    with MemoryProfiler() as profiler:
+        render_addition_pdf(pages=2, seed=0, memory_profiler=profiler)
+    assert [page["page"] for page in profiler.pages] == [0, 1]
+    assert sum(totals["calls"] for totals in profiler.shapes.values()) == 32
+    assert "pages:           2" in profiler.summary()
+
+
+def test_memory_guard_raises_on_growth_past_warmup():
+    retained = []
+    with MemoryProfiler(
+        max_growth_per_page=10000, warmup_pages=1, min_pages=1
+    ) as profiler:
+        with profiler.page(0):
+            retained.append(bytearray(100000))
+        with pytest.raises(MemoryGrowthError):
+            with profiler.page(1):
+                retained.append(bytearray(100000))
+
+
+def test_memory_guard_waits_for_a_window_of_pages():
+    retained = []
+    with MemoryProfiler(
+        max_growth_per_page=10000, warmup_pages=1, min_pages=3
+    ) as profiler:
+        for page_number in range(3):
+            with profiler.page(page_number):
+                retained.append(bytearray(100000 if page_number == 1 else 0))
+        assert profiler.growth_per_page() is None
+        with pytest.raises(MemoryGrowthError):
+            with profiler.page(3):
+                retained.append(bytearray(100000))
+
+
+def test_expected_and_tracked_growth_is_not_counted():
+    document, cache = [], []
+    with MemoryProfiler(warmup_pages=0, min_pages=2) as profiler:
+        profiler.track("cache", lambda: 100000 * len(cache))
+        for page_number in range(2):
+            with profiler.page(page_number):
+                with profiler.expected("document"):
+                    document.append(bytearray(50000))
+                cache.append(bytearray(100000))
+    assert abs(profiler.growth_per_page()) < 5000
+    assert profiler.expected_growth["document"] >= 100000
+
+
+def test_healthy_render_stays_under_the_guard():
+    with MemoryProfiler(max_growth_per_page=20000) as profiler:
+        render_addition_pdf(pages=30, seed=0, memory_profiler=profiler)
+    assert profiler.growth_per_page() is not None
+
+
+class LeakyCanvas(Canvas):
+    retained = []
+
+    def showPage(self):
+        self.retained.append(bytearray(50000))
+        super().showPage()
+
+
+def test_memory_guard_catches_a_canvas_leaking_per_page(monkeypatch):
+    # the canvas' own allocations count, only the content streams it keeps are exempt
+    monkeypatch.setitem(print_module.BACKENDS, "leaky", LeakyCanvas)
+    with MemoryProfiler(max_growth_per_page=20000) as profiler:
+        with pytest.raises(MemoryGrowthError):
+            render_addition_pdf(pages=30, backend="leaky", memory_profiler=profiler)
+    LeakyCanvas.retained.clear()
+
+
+def test_shapes_rendered_by_other_threads_are_not_attributed():
+    with MemoryProfiler() as profiler:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            others = [executor.submit(render_addition_pdf, 5) for _ in range(2)]
+            render_addition_pdf(pages=5, seed=0, memory_profiler=profiler)
+            for other in others:
+                other.result()
+    assert sum(totals["calls"] for totals in profiler.shapes.values()) == 5 * 16
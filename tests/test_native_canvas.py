@@ -0,0 +1,113 @@
+import io
+import re
+from pypdf import PdfReader
+from pypdf.generic import ContentStream
+from reportlab.lib.pagesizes import A4
+from native_canvas import NativeCanvas
+from print import BACKENDS, layout_page, page_rng
+import pytest
+
+
+def render(pages: int) -> bytes:
+    c = NativeCanvas(io.BytesIO(), pagesize=A4)
+    for _ in range(pages):
+        c.setFont("Helvetica", 12)
+        c.saveState()
+        c.translate(10, 20)
+        c.rotate(60)
+        c.circle(0, 0, 5)
+        c.restoreState()
+        c.drawString(1, 2, "(12)")
+        c.showPage()
+    return c.getpdfdata()
+
+
+def test_native_canvas_xref_offsets_point_at_objects():
+    data = render(pages=3)
+    assert data.startswith(b"%PDF-1.3")
+    assert data.endswith(b"%%EOF\n")
+    xref_offset = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n", data[xref_offset:])
+    for number, offset in enumerate(entries, start=1):
+        assert data[int(offset) :].startswith(f"{number} 0 obj".encode())
+    assert b"/Count 3" in data
+
+
+def test_native_canvas_rejects_non_standard_fonts():
+    c = NativeCanvas(io.BytesIO(), pagesize=A4)
+    with pytest.raises(ValueError):
+        c.setFont("ComicSans", 12)
+
+
+def drawing_operators(data: bytes) -> list:
+    """
+    The operators of the first page that end up on paper, with the differences in how the two
+    backends write them evened out: consecutive cm operators are combined into one matrix (reportlab
+    merges translate + rotate), identity matrices are dropped, and text objects become one Tj per
+    string with the font it is drawn in instead of the document's font resource names.
+    """
+    reader = PdfReader(io.BytesIO(data))
+    page = reader.pages[0]
+    fonts = page["/Resources"]["/Font"]
+    operators, matrix, font = [], None, None
+    for operands, operator in ContentStream(page.get_contents(), reader).operations:
+        if operator == b"cm":
+            a, b, c, d, e, f = (float(operand) for operand in operands)
+            if matrix is not None:
+                a0, b0, c0, d0, e0, f0 = matrix
+                a, b, c, d, e, f = (
+                    a * a0 + b * c0,
+                    a * b0 + b * d0,
+                    c * a0 + d * c0,
+                    c * b0 + d * d0,
+                    e * a0 + f * c0 + e0,
+                    e * b0 + f * d0 + f0,
+                )
+            matrix = (a, b, c, d, e, f)
+            continue
+        if matrix is not None:
+            matrix = tuple(round(value, 3) for value in matrix)
+            if matrix != (1, 0, 0, 1, 0, 0):
+                operators.append(("cm", matrix))
+            matrix = None
+        if operator in (b"BT", b"ET", b"TL", b"T*"):
+            continue
+        if operator == b"Tf":
+            font = (str(fonts[operands[0]]["/BaseFont"]), float(operands[1]))
+            continue
+        if operator == b"Tj":
+            operands = [*font, str(operands[0])]
+        operators.append(
+            (
+                operator.decode(),
+                tuple(
+                    round(float(operand), 3) if operator != b"Tj" else operand
+                    for operand in operands
+                ),
+            )
+        )
+    return operators
+
+
+def test_backends_draw_the_same_page():
+    operators = {}
+    for backend, canvas_class in BACKENDS.items():
+        buffer = io.BytesIO()
+        c = canvas_class(buffer, pagesize=A4, pageCompression=0)
+        layout_page(page_rng(3, 0)).replay(c)
+        c.showPage()
+        c.save()
+        operators[backend] = drawing_operators(buffer.getvalue())
+    assert len(operators["native"]) > 100
+    assert operators["native"] == operators["reportlab"]
+
+
+def test_restore_state_restores_the_font():
+    c = NativeCanvas(io.BytesIO(), pagesize=A4)
+    c.setFont("Helvetica", 12)
+    c.saveState()
+    c.setFont("Courier", 20)
+    c.restoreState()
+    assert c.stringWidth("12 + 3") == pytest.approx(
+        c.stringWidth("12 + 3", "Helvetica", 12)
+    )
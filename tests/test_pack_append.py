@@ -0,0 +1,68 @@
+import io
+import yaml
+from pypdf import PdfReader
+from config import DEFAULT_CONFIG_PATH, load_config
+from pack_append import (
+    append_pages,
+    pack_problem_keys,
+    page_problems,
+    problem_key,
+    read_pack_metadata,
+)
+from print import PROBLEMS_PER_PAGE, render_addition_pdf
+import pytest
+
+
+@pytest.mark.parametrize("backend", ["reportlab", "native"])
+def test_append_renders_only_new_problems_after_the_existing_pack(tmp_path, backend):
+    path = tmp_path / "pack.pdf"
+    original = render_addition_pdf(4, backend, seed=11)
+    path.write_bytes(original)
+    original_keys = pack_problem_keys(11, [4])
+
+    assert append_pages(str(path), 2) == 6
+    assert append_pages(str(path), 3) == 9
+
+    reader = PdfReader(str(path))
+    assert len(reader.pages) == 9
+    original_reader = PdfReader(io.BytesIO(original))
+    for page, original_page in zip(reader.pages, original_reader.pages):
+        assert page.get_contents().get_data() == original_page.get_contents().get_data()
+    metadata = read_pack_metadata(reader)
+    assert metadata["segments"] == [4, 2, 3]
+    assert metadata["backend"] == backend
+
+    seen = set(original_keys)
+    appended = []
+    for page_number in range(4, 9):
+        _, math_problems = page_problems(11, page_number, seen)
+        appended += [problem_key(problem) for problem in math_problems]
+    assert len(set(appended)) == 5 * PROBLEMS_PER_PAGE
+    assert not original_keys & set(appended)
+    assert pack_problem_keys(11, [4, 2, 3]) == original_keys | set(appended)
+
+
+def test_append_needs_a_seeded_pack(tmp_path):
+    path = tmp_path / "pack.pdf"
+    path.write_bytes(render_addition_pdf(1))
+    with pytest.raises(ValueError):
+        append_pages(str(path), 1)
+
+
+def test_append_uses_the_config_stored_in_the_pack(tmp_path):
+    config_path = tmp_path / "conf.yml"
+    config = {**load_config(DEFAULT_CONFIG_PATH), "MIN_NUMBER": 100}
+    # integer keys and dates don't survive a round trip through the pack's JSON metadata
+    config_path.write_text(
+        yaml.safe_dump(config)
+        + "NOTES:\n  1: first\n  two: second\nCREATED: 2024-01-01\n"
+    )
+    path = tmp_path / "pack.pdf"
+    path.write_bytes(render_addition_pdf(2, seed=5, config_path=str(config_path)))
+
+    # appended with the default config active, the new pages still follow the pack's config
+    assert append_pages(str(path), 1) == 3
+    metadata = read_pack_metadata(PdfReader(str(path)))
+    assert metadata["config"]["MIN_NUMBER"] == 100
+    keys = pack_problem_keys(5, metadata["segments"], str(config_path))
+    assert all(a >= 100 and b >= 100 for a, b, _ in keys)
@@ -0,0 +1,73 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+import yaml
+from config import DEFAULT_CONFIG_PATH, config_cache, load_config
+import print as print_module
+from preview import PreviewRenderer, preview_spec, render_preview_page, spec_hash
+from print import clear_page_cache, render_addition_pdf
+
+
+def test_preview_pages_are_deterministic_and_cached_on_disk(tmp_path):
+    spec = preview_spec(seed=1, pages=3, scale=0.1)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        renderer = PreviewRenderer(cache_dir=str(tmp_path), executor=executor)
+        pages = list(renderer.pages(spec))
+    assert [page_number for page_number, _ in pages] == [0, 1, 2]
+    assert all(png.startswith(b"\x89PNG") for _, png in pages)
+    assert len(os.listdir(tmp_path / spec_hash(spec))) == 3
+
+    # a fresh renderer is served from the disk cache without an executor
+    assert list(PreviewRenderer(cache_dir=str(tmp_path)).pages(spec)) == pages
+    assert PreviewRenderer().page(spec, 2) == pages[2][1]
+
+
+def test_spec_hash_changes_with_seed():
+    assert spec_hash(preview_spec(seed=1, pages=3)) != spec_hash(
+        preview_spec(seed=2, pages=3)
+    )
+
+
+def test_pages_render_from_the_spec_config(tmp_path):
+    path = tmp_path / "conf.yml"
+    config = {**load_config(DEFAULT_CONFIG_PATH), "MIN_NUMBER": 100}
+    path.write_text(yaml.safe_dump(config))
+    spec = preview_spec(seed=1, pages=2, scale=0.1, config_path=str(path))
+    default_spec = preview_spec(seed=1, pages=2, scale=0.1)
+    local = render_preview_page(spec, 1)
+    assert local != render_preview_page(default_spec, 1)
+    # previewing another config leaves the process's config alone
+    assert load_config() == load_config(DEFAULT_CONFIG_PATH)
+
+    # spawned workers start with the default config, threads render different specs at once
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+        assert executor.submit(render_preview_page, spec, 1).result() == local
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        specs = [spec, default_spec] * 4
+        pngs = list(executor.map(render_preview_page, specs, [1] * len(specs)))
+    assert pngs == [render_preview_page(spec, 1) for spec in specs]
+
+    # a page rendered from the edited file would be cached under the old spec's hash
+    path.write_text(yaml.safe_dump({**config, "MIN_NUMBER": 90}))
+    config_cache(str(path)).check_interval = 0
+    with pytest.raises(ValueError):
+        render_preview_page(spec, 1)
+
+
+def test_previewed_pages_are_not_laid_out_again_for_printing(monkeypatch):
+    laid_out = []
+    layout_page = print_module.layout_page
+    monkeypatch.setattr(
+        print_module,
+        "layout_page",
+        lambda *args, **kwargs: laid_out.append(args) or layout_page(*args, **kwargs),
+    )
+    clear_page_cache()
+    spec = preview_spec(seed=7, pages=2, scale=0.1)
+    pngs = [render_preview_page(spec, page_number) for page_number in range(2)]
+    render_addition_pdf(2, seed=7)
+    assert len(laid_out) == 2
+    # the shared layouts are replayed, not changed
+    assert pngs == [render_preview_page(spec, page_number) for page_number in range(2)]
@@ -0,0 +1,66 @@
+import random
+from collections import Counter
+from shapes import SHAPE_NAMES, ShapeScheduler
+import pytest
+
+
+@pytest.mark.parametrize("count", [1, 5, 7, 16, 101])
+def test_balanced_schedule_is_even_without_adjacent_repeats(count):
+    for seed in range(50):
+        shapes = ShapeScheduler("balanced").schedule(count, random.Random(seed))
+        counts = Counter(shapes)
+        assert len(shapes) == count
+        assert max(counts.values()) - min(counts.get(s, 0) for s in SHAPE_NAMES) <= 1
+        assert all(first != second for first, second in zip(shapes, shapes[1:]))
+
+
+def test_no_repeat_schedule_never_repeats_a_shape():
+    shapes = ShapeScheduler("no_repeat").schedule(500, random.Random(0))
+    assert all(first != second for first, second in zip(shapes, shapes[1:]))
+
+
+def test_weighted_and_favorite_schedules_follow_the_weights():
+    shapes = ShapeScheduler("weighted", weights={"cat": 1, "robot": 3}).schedule(
+        4000, random.Random(0)
+    )
+    assert set(shapes) == {"cat", "robot"}
+    assert 2.5 < shapes.count("robot") / shapes.count("cat") < 3.5
+
+    shapes = ShapeScheduler(
+        "favorites", favorites=["balloon"], favorite_share=0.8
+    ).schedule(4000, random.Random(0))
+    assert 0.75 < shapes.count("balloon") / len(shapes) < 0.85
+    assert set(shapes) == set(SHAPE_NAMES)
+
+
+def test_schedule_is_reproducible_from_the_rng():
+    scheduler = ShapeScheduler("balanced")
+    assert scheduler.schedule(16, random.Random(3)) == scheduler.schedule(
+        16, random.Random(3)
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"policy": "clumpy"},
+        {"policy": "weighted", "weights": {"dragon": 1}},
+        {"policy": "weighted", "weights": {}},
+        {"policy": "favorites"},
+        {"policy": "weighted", "weights": {"cat": -1, "robot": 2}},
+        {"policy": "favorites", "favorites": ["cat"], "favorite_share": 1.5},
+        {"policy": "favorites", "favorites": ["cat"], "favorite_share": -0.5},
+    ],
+)
+def test_invalid_scheduler_raises(kwargs):
+    with pytest.raises(ValueError):
+        ShapeScheduler(**kwargs)
+
+
+def test_duplicate_favorites_keep_their_share():
+    scheduler = ShapeScheduler(
+        "favorites", favorites=["cat", "cat", "robot"], favorite_share=0.5
+    )
+    assert scheduler.schedule(20000, random.Random(0)).count("cat") == pytest.approx(
+        5000, rel=0.05
+    )
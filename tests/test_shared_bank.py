@@ -0,0 +1,67 @@
+import sys
+import os
+import subprocess
+import time
+import numpy as np
+from shared_bank import FIELDS, SharedProblemBank, render_bank_pdf
+from utils import SingleProblemMathProperties
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_problems(count: int, operator: str = "+"):
+    return [
+        SingleProblemMathProperties(
+            number_factory=lambda i=i: (i + 10, i + 1), operator=operator
+        )
+        for i in range(count)
+    ]
+
+
+def test_shared_bank_stores_problem_columns():
+    with SharedProblemBank.create(make_problems(20) + make_problems(4, "/")) as bank:
+        assert bank.array.shape == (24, len(FIELDS))
+        assert bank.array[0].tolist()[:4] == [10, 1, 0, 11]
+        assert bank.array[-1].tolist()[:4] == [13, 4, 3, 3]
+        assert bank.pages() == 2
+        assert len(bank.page(1)) == 8
+
+
+def test_attached_bank_shares_memory_with_creator():
+    with SharedProblemBank.create(make_problems(32)) as bank:
+        attached = SharedProblemBank.attach(bank.name)
+        try:
+            assert attached.size == 32
+            bank.array[17, 0] = 99
+            assert np.shares_memory(attached.page(1), attached.array)
+            assert str(attached.math_problems(1)[1]) == "99 + 18"
+        finally:
+            attached.close()
+
+
+def test_render_bank_pdf_renders_requested_pages():
+    with SharedProblemBank.create(make_problems(48)) as bank:
+        data = render_bank_pdf(bank.name, [0, 2], backend="native")
+    assert data.startswith(b"%PDF") and b"/Count 2" in data
+
+
+def test_render_bank_pdf_renders_a_partial_last_page():
+    with SharedProblemBank.create(make_problems(20)) as bank:
+        data = render_bank_pdf(bank.name, range(bank.pages()), backend="native")
+    assert b"/Count 2" in data
+
+
+def test_bank_outlives_an_independent_process_that_attached_to_it():
+    script = (
+        f"import sys; sys.path.insert(0, {ROOT!r}); from shared_bank import SharedProblemBank;"
+        f"SharedProblemBank.attach({{name!r}}).close()"
+    )
+    with SharedProblemBank.create(make_problems(16)) as bank:
+        subprocess.run(
+            [sys.executable, "-c", script.format(name=bank.name)], check=True
+        )
+        # the attaching process's resource tracker cleans up right after it exits
+        time.sleep(0.5)
+        attached = SharedProblemBank.attach(bank.name)
+        assert attached.size == 16
+        attached.close()